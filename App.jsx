@@ -65,6 +65,24 @@ function App() {
     }
   }
 
+  const waitForJob = async (statusUrl) => {
+    // Poll the job queue until the render finishes
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 2000))
+      const response = await fetch(statusUrl)
+      if (!response.ok) {
+        throw new Error('Job status check failed')
+      }
+      const job = await response.json()
+      if (job.status === 'completed') {
+        return job
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Video generation failed')
+      }
+    }
+  }
+
   const loadDrafts = async () => {
     try {
       const endpoint = isOnline ? '/api/offline/list-drafts' : null
@@ -213,7 +231,10 @@ function App() {
         })
 
         if (response.ok) {
-          const result = await response.json()
+          let result = await response.json()
+          if (result.status_url) {
+            result = { ...result, ...(await waitForJob(result.status_url)) }
+          }
           setGeneratedVideo(result)
         } else {
           throw new Error('Video generation failed')
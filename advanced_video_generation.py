@@ -3,17 +3,50 @@ import requests
 import json
 import subprocess
 import tempfile
+import threading
 from datetime import datetime
-from openai import OpenAI
-import moviepy.editor as mp
 from PIL import Image, ImageDraw, ImageFont
-import numpy as np
+from src.services.workspace import JobWorkspace, cleanup_stale_workspaces
+from src.services.text_layout import load_font
+from src.services.rate_limiter import provider_limits
+from src.services.http_client import media_downloader
+from src.services.media_cache import image_cache, image_cache_key
+from src.services.provider_health import provider_health
+from src.services.audio_timeline import assemble_narration, encode_timeline
+
+# Per-request timeout for OpenAI calls; the SDK default waits up to 10 minutes
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+
+SUBTITLE_STYLE = 'FontSize=24,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2'
+SUBTITLE_MAX_CHARS = 84  # About two lines at FontSize=24
 
 class AdvancedVideoGenerationService:
     def __init__(self):
-        self.openai_client = OpenAI()
+        # The OpenAI SDK is imported on first use to keep worker startup fast
+        self._openai_client = None
+        self._openai_lock = threading.Lock()
+        for provider in ('openai_chat', 'openai_images', 'openai_tts'):
+            provider_health.register_probe(provider, self._probe_openai)
         self.temp_dir = "/tmp/video_generation"
+        self.jobs_dir = os.path.join(self.temp_dir, 'jobs')
+        self.videos_dir = os.path.join(self.temp_dir, 'videos')
         os.makedirs(self.temp_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        os.makedirs(self.videos_dir, exist_ok=True)
+        cleanup_stale_workspaces(self.jobs_dir)
+    
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            with self._openai_lock:
+                if self._openai_client is None:
+                    from openai import OpenAI
+                    self._openai_client = OpenAI(timeout=OPENAI_TIMEOUT)
+        return self._openai_client
+    
+    def _probe_openai(self):
+        """Cheap authenticated request used to recover the OpenAI circuits"""
+        self.openai_client.models.list()
     
     def generate_video_from_script(self, script, options=None):
         """
@@ -23,27 +56,51 @@ class AdvancedVideoGenerationService:
             options = {}
         
         style = options.get('style', 'realistic')
-        duration_per_scene = options.get('duration_per_scene', 3)
         resolution = options.get('resolution', '1280x720')
         fps = options.get('fps', 30)
         voice_id = options.get('voice_id', 'default')
         include_subtitles = options.get('include_subtitles', True)
         background_music = options.get('background_music', False)
+        use_cache = options.get('use_cache', True)
         
         # Parse script into scenes
         scenes = self._parse_script_into_scenes(script)
         
-        # Generate content for each scene
-        video_clips = []
-        for i, scene in enumerate(scenes):
-            clip = self._generate_scene_clip(
-                scene, i, style, duration_per_scene, 
-                resolution, fps, voice_id, include_subtitles
+        # Scene files live in a per-job workspace so concurrent jobs never collide
+        with JobWorkspace(self.jobs_dir, options.get('job_id')) as workspace:
+            # Generate visuals and narration for each scene
+            scene_media = [
+                self._generate_scene_media(scene, i, style, voice_id, workspace.dir, use_cache)
+                for i, scene in enumerate(scenes)
+            ]
+            
+            # Narration is joined once; its offsets time both the images and the subtitles
+            narration = assemble_narration(
+                [audio_path for _, audio_path in scene_media],
+                workspace.path('narration.wav'),
+                normalize=options.get('normalize_audio')
             )
-            video_clips.append(clip)
-        
-        # Combine clips into final video
-        final_video = self._combine_clips(video_clips, background_music)
+            
+            subtitle_mode = self._subtitle_mode(include_subtitles)
+            subtitle_path = None
+            if subtitle_mode:
+                subtitle_path = self._write_subtitles(
+                    [scene['text'] for scene in scenes], narration.segments, workspace.path('subtitles.srt')
+                )
+            
+            # Encode the whole video in one pass, then mix in music if requested
+            final_path = os.path.join(self.videos_dir, f'{workspace.job_id}.mp4')
+            encoded_path = workspace.path('combined.mp4') if background_music else final_path
+            final_video = encode_timeline(
+                [visual_path for visual_path, _ in scene_media], narration, encoded_path,
+                resolution, fps, subtitle_path, subtitle_mode, SUBTITLE_STYLE,
+                encode_profile=options.get('encode_profile', 'default')
+            )
+            
+            if final_video and background_music:
+                music_path = self._generate_background_music('cinematic', workspace.dir)
+                self._add_background_music(final_video, music_path, final_path)
+                final_video = final_path
         
         return final_video
     
@@ -56,13 +113,15 @@ class AdvancedVideoGenerationService:
         avatar_ethnicity = avatar_config.get('ethnicity', 'diverse')
         background = avatar_config.get('background', 'office')
         
-        # Generate avatar images for different expressions
-        avatar_images = self._generate_avatar_images(
-            avatar_style, avatar_gender, avatar_ethnicity, background
-        )
-        
-        # Generate lip-sync animation (simplified)
-        animated_avatar = self._create_avatar_animation(avatar_images, script)
+        # Avatar stills live in a per-job workspace so concurrent jobs never collide
+        with JobWorkspace(self.jobs_dir, avatar_config.get('job_id')) as workspace:
+            # Generate avatar images for different expressions
+            avatar_images = self._generate_avatar_images(
+                avatar_style, avatar_gender, avatar_ethnicity, background, workspace.dir
+            )
+            
+            # Generate lip-sync animation (simplified)
+            animated_avatar = self._create_avatar_animation(avatar_images, script)
         
         return animated_avatar
     
@@ -173,11 +232,15 @@ class AdvancedVideoGenerationService:
         """
         
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
+            def request_scenes():
+                with provider_limits.slot('openai_chat'):
+                    return self.openai_client.chat.completions.create(
+                        model="gpt-4",
+                        messages=[{"role": "user", "content": prompt}],
+                        response_format={"type": "json_object"}
+                    )
+            
+            response = provider_health.call('openai_chat', request_scenes)
             
             scenes_data = json.loads(response.choices[0].message.content)
             return scenes_data.get('scenes', [{'text': script, 'visual_description': script}])
@@ -186,51 +249,47 @@ class AdvancedVideoGenerationService:
             sentences = script.split('. ')
             return [{'text': s.strip() + '.', 'visual_description': s.strip()} for s in sentences if s.strip()]
     
-    def _generate_scene_clip(self, scene, index, style, duration, resolution, fps, voice_id, include_subtitles):
-        """Generate video clip for a single scene"""
-        scene_dir = os.path.join(self.temp_dir, f"scene_{index}")
+    def _generate_scene_media(self, scene, index, style, voice_id, work_dir=None, use_cache=True):
+        """Generate the visual and narration for a single scene"""
+        scene_dir = os.path.join(work_dir or self.temp_dir, f"scene_{index}")
         os.makedirs(scene_dir, exist_ok=True)
         
         # Generate visuals for scene
         visual_path = os.path.join(scene_dir, f"visual_{index}.png")
-        self._generate_scene_visual(scene['visual_description'], visual_path, style)
+        self._generate_scene_visual(scene['visual_description'], visual_path, style, use_cache)
         
         # Generate audio for scene
         audio_path = os.path.join(scene_dir, f"audio_{index}.wav")
         self._generate_scene_audio(scene['text'], audio_path, voice_id)
         
-        # Create video clip
-        clip_path = os.path.join(scene_dir, f"clip_{index}.mp4")
-        self._create_video_clip(visual_path, audio_path, clip_path, duration, resolution, fps)
-        
-        # Add subtitles if requested
-        if include_subtitles:
-            subtitled_path = os.path.join(scene_dir, f"subtitled_{index}.mp4")
-            self._add_subtitles_to_clip(clip_path, scene['text'], subtitled_path)
-            return subtitled_path
-        
-        return clip_path
+        return visual_path, audio_path
     
-    def _generate_scene_visual(self, description, output_path, style):
+    def _generate_scene_visual(self, description, output_path, style, use_cache=True):
         """Generate visual for scene using AI"""
         try:
             # Enhance description for better image generation
             enhanced_prompt = f"{description}, {style} style, cinematic lighting, high quality, 16:9 aspect ratio"
             
-            response = self.openai_client.images.generate(
-                model="dall-e-3",
-                prompt=enhanced_prompt,
-                size="1792x1024",
-                quality="hd",
-                n=1
-            )
+            cache_key = image_cache_key(enhanced_prompt, style, "1792x1024", "dall-e-3", "hd")
+            if use_cache and image_cache.fetch(cache_key, output_path):
+                return
+            
+            def request_image():
+                with provider_limits.slot('openai_images'):
+                    return self.openai_client.images.generate(
+                        model="dall-e-3",
+                        prompt=enhanced_prompt,
+                        size="1792x1024",
+                        quality="hd",
+                        n=1
+                    )
+            
+            response = provider_health.call('openai_images', request_image)
             
             # Download and save image
             image_url = response.data[0].url
-            image_response = requests.get(image_url)
-            
-            with open(output_path, 'wb') as f:
-                f.write(image_response.content)
+            media_downloader.download(image_url, output_path)
+            image_cache.put(cache_key, output_path)
                 
         except Exception as e:
             print(f"Image generation failed: {e}")
@@ -240,13 +299,17 @@ class AdvancedVideoGenerationService:
     def _generate_scene_audio(self, text, output_path, voice_id):
         """Generate audio for scene"""
         try:
-            response = self.openai_client.audio.speech.create(
-                model="tts-1-hd",
-                voice="alloy" if voice_id == 'default' else voice_id,
-                input=text
-            )
+            def synthesize():
+                with provider_limits.slot('openai_tts'):
+                    response = self.openai_client.audio.speech.create(
+                        model="tts-1-hd",
+                        voice="alloy" if voice_id == 'default' else voice_id,
+                        input=text
+                    )
+                    
+                    response.stream_to_file(output_path)
             
-            response.stream_to_file(output_path)
+            provider_health.call('openai_tts', synthesize)
             
         except Exception as e:
             print(f"Audio generation failed: {e}")
@@ -257,72 +320,48 @@ class AdvancedVideoGenerationService:
                 '-y', output_path
             ], capture_output=True)
     
-    def _create_video_clip(self, visual_path, audio_path, output_path, duration, resolution, fps):
-        """Create video clip from visual and audio"""
-        cmd = [
-            'ffmpeg', '-y',
-            '-loop', '1', '-i', visual_path,
-            '-i', audio_path,
-            '-c:v', 'libx264', '-c:a', 'aac',
-            '-shortest', '-pix_fmt', 'yuv420p',
-            '-vf', f'scale={resolution.replace("x", ":")}',
-            '-r', str(fps),
-            output_path
-        ]
-        
-        subprocess.run(cmd, capture_output=True)
+    def _subtitle_mode(self, include_subtitles):
+        """Map the include_subtitles option to 'burn', 'soft' or None"""
+        if include_subtitles in ('soft', 'mov_text'):
+            return 'soft'
+        if include_subtitles:
+            return 'burn'
+        return None
     
-    def _add_subtitles_to_clip(self, video_path, text, output_path):
-        """Add subtitles to video clip"""
-        # Create subtitle file
-        srt_path = video_path.replace('.mp4', '.srt')
-        with open(srt_path, 'w') as f:
-            f.write(f"1\n00:00:00,000 --> 00:00:10,000\n{text}\n\n")
-        
-        # Add subtitles to video
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', video_path,
-            '-vf', f"subtitles={srt_path}:force_style='FontSize=24,PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2'",
-            '-c:a', 'copy',
-            output_path
-        ]
-        
-        subprocess.run(cmd, capture_output=True)
+    def _write_subtitles(self, texts, segments, srt_path):
+        """
+        Write one SRT for the whole video. Each scene's text is shown during its
+        narration segment, split into cues timed by character count.
+        """
+        number = 1
+        with open(srt_path, 'w', encoding='utf-8') as f:
+            for text, (scene_start, scene_end) in zip(texts, segments):
+                # Split into cues of whole words that fit on about two lines
+                cues = []
+                for word in text.split():
+                    if cues and len(cues[-1]) + 1 + len(word) <= SUBTITLE_MAX_CHARS:
+                        cues[-1] += ' ' + word
+                    else:
+                        cues.append(word)
+                
+                total_chars = sum(len(cue) for cue in cues) or 1
+                start = scene_start
+                for i, cue in enumerate(cues, 1):
+                    end = scene_end if i == len(cues) else start + (scene_end - scene_start) * len(cue) / total_chars
+                    f.write(f"{number}\n{self._srt_timestamp(start)} --> {self._srt_timestamp(end)}\n{cue}\n\n")
+                    number += 1
+                    start = end
+        
+        return srt_path
     
-    def _combine_clips(self, video_clips, background_music=False):
-        """Combine multiple video clips into final video"""
-        if not video_clips:
-            return None
-        
-        # Create concat file
-        concat_file = os.path.join(self.temp_dir, 'concat_list.txt')
-        with open(concat_file, 'w') as f:
-            for clip in video_clips:
-                if os.path.exists(clip):
-                    f.write(f"file '{clip}'\n")
-        
-        # Combine videos
-        final_path = os.path.join(self.temp_dir, 'final_video.mp4')
-        cmd = [
-            'ffmpeg', '-y',
-            '-f', 'concat', '-safe', '0', '-i', concat_file,
-            '-c', 'copy',
-            final_path
-        ]
-        
-        subprocess.run(cmd, capture_output=True)
-        
-        # Add background music if requested
-        if background_music:
-            music_path = self._generate_background_music('cinematic')
-            final_with_music = os.path.join(self.temp_dir, 'final_with_music.mp4')
-            self._add_background_music(final_path, music_path, final_with_music)
-            return final_with_music
-        
-        return final_path
+    def _srt_timestamp(self, seconds):
+        milliseconds = int(round(seconds * 1000))
+        hours, milliseconds = divmod(milliseconds, 3600000)
+        minutes, milliseconds = divmod(milliseconds, 60000)
+        seconds, milliseconds = divmod(milliseconds, 1000)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
     
-    def _generate_avatar_images(self, style, gender, ethnicity, background):
+    def _generate_avatar_images(self, style, gender, ethnicity, background, work_dir):
         """Generate AI avatar images"""
         avatar_prompts = [
             f"{style} {gender} person of {ethnicity} ethnicity in {background} setting, neutral expression, professional headshot",
@@ -333,27 +372,28 @@ class AdvancedVideoGenerationService:
         avatar_images = []
         for i, prompt in enumerate(avatar_prompts):
             try:
-                response = self.openai_client.images.generate(
-                    model="dall-e-3",
-                    prompt=prompt,
-                    size="1024x1024",
-                    quality="hd",
-                    n=1
-                )
+                def request_avatar():
+                    with provider_limits.slot('openai_images'):
+                        return self.openai_client.images.generate(
+                            model="dall-e-3",
+                            prompt=prompt,
+                            size="1024x1024",
+                            quality="hd",
+                            n=1
+                        )
                 
-                image_path = os.path.join(self.temp_dir, f'avatar_{i}.png')
-                image_url = response.data[0].url
-                image_response = requests.get(image_url)
+                response = provider_health.call('openai_images', request_avatar)
                 
-                with open(image_path, 'wb') as f:
-                    f.write(image_response.content)
+                image_path = os.path.join(work_dir, f'avatar_{i}.png')
+                image_url = response.data[0].url
+                media_downloader.download(image_url, image_path)
                 
                 avatar_images.append(image_path)
                 
             except Exception as e:
                 print(f"Avatar generation failed: {e}")
                 # Create fallback avatar
-                fallback_path = os.path.join(self.temp_dir, f'avatar_fallback_{i}.png')
+                fallback_path = os.path.join(work_dir, f'avatar_fallback_{i}.png')
                 self._create_fallback_avatar(fallback_path)
                 avatar_images.append(fallback_path)
         
@@ -364,11 +404,8 @@ class AdvancedVideoGenerationService:
         img = Image.new('RGB', (1792, 1024), color='lightblue')
         draw = ImageDraw.Draw(img)
         
-        # Try to load a font, fallback to default if not available
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 48)
-        except:
-            font = ImageFont.load_default()
+        # Font is loaded once per process
+        font = load_font()
         
         # Add text to image
         text = description[:50] + "..." if len(description) > 50 else description
@@ -396,11 +433,11 @@ class AdvancedVideoGenerationService:
         
         img.save(output_path)
     
-    def _generate_background_music(self, style):
+    def _generate_background_music(self, style, work_dir=None):
         """Generate or select background music"""
         # For now, create a simple tone as placeholder
         # In production, you would integrate with music generation APIs
-        music_path = os.path.join(self.temp_dir, f'music_{style}.wav')
+        music_path = os.path.join(work_dir or self.temp_dir, f'music_{style}.wav')
         
         # Create a simple background tone
         cmd = [
@@ -0,0 +1,207 @@
+import os
+import subprocess
+import wave
+import numpy as np
+from src.services.encode_profiles import encode_fps, encode_resolution, video_encoder_args
+
+NARRATION_SAMPLE_RATE = 44100
+NARRATION_TARGET_DBFS = float(os.getenv('NARRATION_TARGET_DBFS', '-20'))
+NARRATION_PEAK_DBFS = -1.0
+
+
+class NarrationTrack:
+    """One WAV holding every segment's narration, plus where each segment sits in it"""
+
+    def __init__(self, path, sample_rate, segments):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.segments = segments  # [(start_seconds, end_seconds), ...] in script order
+
+    @property
+    def duration(self):
+        return self.segments[-1][1] if self.segments else 0.0
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'sample_rate': self.sample_rate,
+            'duration': self.duration,
+            'segments': [{'start': start, 'end': end} for start, end in self.segments]
+        }
+
+
+def decode_audio(path, sample_rate=NARRATION_SAMPLE_RATE):
+    """Mono float32 samples of `path` at `sample_rate`; empty if it cannot be decoded"""
+    for reader in (_read_with_soundfile, _read_pcm_wav):
+        decoded = reader(path)
+        if decoded is not None:
+            samples, rate = decoded
+            return _resample(samples, rate, sample_rate)
+
+    # MP3 and other compressed formats (e.g. remote TTS output)
+    return _decode_with_ffmpeg(path, sample_rate)
+
+
+def _read_with_soundfile(path):
+    try:
+        import soundfile as sf
+        data, rate = sf.read(path, dtype='float32', always_2d=True)
+    except Exception:
+        return None
+    return data.mean(axis=1), rate
+
+
+def _read_pcm_wav(path):
+    try:
+        with wave.open(path, 'rb') as wav_file:
+            if wav_file.getsampwidth() != 2:
+                return None
+            channels = wav_file.getnchannels()
+            rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except Exception:
+        return None
+    samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+    return samples.reshape(-1, channels).mean(axis=1), rate
+
+
+def _decode_with_ffmpeg(path, sample_rate):
+    cmd = [
+        'ffmpeg', '-v', 'error', '-i', path,
+        '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), '-'
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True)
+    except OSError as e:
+        print(f"Audio decode failed for {path}: {e}")
+        return np.zeros(0, dtype=np.float32)
+    if result.returncode != 0:
+        print(f"Audio decode failed for {path}: {result.stderr.decode(errors='replace')[-500:]}")
+        return np.zeros(0, dtype=np.float32)
+    return np.frombuffer(result.stdout, dtype='<f4').astype(np.float32)
+
+
+def _resample(samples, from_rate, to_rate):
+    """Linear-interpolation resample; TTS output is upsampled, where this is transparent"""
+    if from_rate == to_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+    length = int(round(len(samples) * to_rate / from_rate))
+    positions = np.arange(length, dtype=np.float64) * (from_rate / to_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def normalize_loudness(samples, target_dbfs=NARRATION_TARGET_DBFS, peak_dbfs=NARRATION_PEAK_DBFS):
+    """Scale to an RMS level of `target_dbfs`, without pushing peaks above `peak_dbfs`"""
+    if len(samples) == 0:
+        return samples
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+    peak = float(np.max(np.abs(samples)))
+    if rms < 1e-5:
+        return samples  # Silence
+    gain = min(10 ** (target_dbfs / 20) / rms, 10 ** (peak_dbfs / 20) / peak)
+    return (samples * gain).astype(np.float32)
+
+
+def write_wav(path, samples, sample_rate):
+    """Write mono float samples as 16-bit PCM"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return path
+
+
+def assemble_narration(audio_paths, output_path, sample_rate=NARRATION_SAMPLE_RATE, normalize=None):
+    """
+    Decode and concatenate every segment's audio into one gapless WAV.
+    With `normalize` (when None, set by NARRATION_NORMALIZE=1), each segment is leveled
+    separately so clips from different TTS engines match.
+    Segments that cannot be decoded get zero length.
+    """
+    if normalize is None:
+        normalize = os.getenv('NARRATION_NORMALIZE', '0') == '1'
+
+    pieces = []
+    segments = []
+    position = 0
+    for path in audio_paths:
+        samples = decode_audio(path, sample_rate) if path and os.path.exists(path) else np.zeros(0, dtype=np.float32)
+        if normalize:
+            samples = normalize_loudness(samples)
+        pieces.append(samples)
+        segments.append((position / sample_rate, (position + len(samples)) / sample_rate))
+        position += len(samples)
+
+    narration = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    write_wav(output_path, narration, sample_rate)
+    return NarrationTrack(output_path, sample_rate, segments)
+
+
+def write_image_timeline(image_paths, segments, list_path, fps):
+    """
+    Write a concat-demuxer list showing each image for its segment.
+    Boundaries are snapped to whole frames so rounding never drifts from the audio.
+    """
+    entries = []
+    for image_path, (start, end) in zip(image_paths, segments):
+        frames = round(end * fps) - round(start * fps)
+        if frames > 0:
+            entries.append((image_path, frames / fps))
+
+    with open(list_path, 'w') as f:
+        for image_path, duration in entries:
+            f.write(f"file '{image_path}'\nduration {duration:.6f}\n")
+        if entries:
+            # The demuxer ignores the last duration unless the file is repeated
+            f.write(f"file '{entries[-1][0]}'\n")
+
+    return len(entries)
+
+
+def encode_timeline(image_paths, narration, output_path, resolution='1280x720', fps=25,
+                    subtitle_path=None, subtitle_mode=None, subtitle_style=None, list_path=None,
+                    encode_profile='default'):
+    """
+    Encode the image timeline and the narration track together in one ffmpeg run.
+    subtitle_mode 'burn' draws `subtitle_path` onto the video; 'soft' muxes it as mov_text.
+    encode_profile picks the x264 settings (see encode_profiles).
+    Returns `output_path`, or None if the encode fails.
+    """
+    rate = encode_fps(encode_profile, fps)
+    resolution = encode_resolution(encode_profile, resolution)
+    if list_path is None:
+        list_path = os.path.splitext(narration.path)[0] + '_timeline.txt'
+    if not write_image_timeline(image_paths, narration.segments, list_path, rate):
+        print("Timeline encode skipped: no segment has audio")
+        return None
+
+    video_filter = f'scale={resolution.replace("x", ":")},setsar=1,fps={rate}'
+    if subtitle_path and subtitle_mode == 'burn':
+        video_filter += f",subtitles={subtitle_path}"
+        if subtitle_style:
+            video_filter += f":force_style='{subtitle_style}'"
+    video_filter += ',format=yuv420p'
+
+    cmd = [
+        'ffmpeg', '-y',
+        '-f', 'concat', '-safe', '0', '-i', list_path,
+        '-i', narration.path
+    ]
+    maps = ['-map', '0:v', '-map', '1:a']
+    if subtitle_path and subtitle_mode == 'soft':
+        cmd += ['-i', subtitle_path]
+        maps += ['-map', '2:s', '-c:s', 'mov_text']
+    cmd += maps + ['-vf', video_filter] + video_encoder_args(encode_profile, fps) + [
+        '-c:a', 'aac',
+        '-pix_fmt', 'yuv420p',
+        output_path
+    ]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Timeline encode failed: {result.stderr[-2000:]}")
+        return None
+
+    return output_path
@@ -0,0 +1,287 @@
+"""
+Rendering benchmarks for the offline pipeline.
+
+Run from the project root, e.g.:
+    python -m src.services.benchmarks render --sentences 40
+    python -m src.services.benchmarks importtime --budget-ms 500
+    python -m src.services.benchmarks encode --sentences 20
+"""
+import argparse
+import math
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.services.offline_ai_service import OfflineAIService
+from src.services.audio_timeline import assemble_narration, encode_timeline
+from src.services.encode_profiles import ENCODE_PROFILES
+
+SAMPLE_SENTENCE = "Our business grew steadily this quarter thanks to new technology and a great team"
+
+# Modules loaded by workers and CLI tools, which should import quickly
+IMPORT_TIME_MODULES = [
+    'src.services.advanced_video_generation',
+    'src.services.dzongkha_service',
+    'src.services.offline_ai_service',
+    'src.services.image_generation',
+    'src.services.voice_cloning',
+    'src.services.job_queue'
+]
+
+
+def files_written_since(directory, started):
+    """Return total bytes of files under `directory` modified after `started`"""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_mtime >= started:
+                total += stat.st_size
+    return total
+
+
+def bench_render(sentences):
+    """Compare per-segment encoding against the single-pass and narration timeline renderers"""
+    service = OfflineAIService()
+    script = '. '.join(f"{SAMPLE_SENTENCE} {i}" for i in range(sentences))
+
+    # Media generation is shared by both modes, so only the encode step is timed
+    segment_media = []
+    for segment in service.split_script(script):
+        audio_path = service.generate_speech_offline(segment)
+        image_path = service.generate_image_offline(segment)
+        segment_media.append((image_path, audio_path))
+
+    results = {}
+
+    started = time.time()
+    video_segments = [
+        service.create_video_segment(image_path, audio_path, i)
+        for i, (image_path, audio_path) in enumerate(segment_media)
+    ]
+    service.combine_video_segments(video_segments)
+    results['segments'] = (time.time() - started, files_written_since(service.temp_dir, started))
+
+    started = time.time()
+    service.render_video_single_pass(segment_media)
+    results['single_pass'] = (time.time() - started, files_written_since(service.temp_dir, started))
+
+    started = time.time()
+    narration = assemble_narration([audio_path for _, audio_path in segment_media], os.path.join(service.temp_dir, 'narration.wav'))
+    encode_timeline([image_path for image_path, _ in segment_media], narration, os.path.join(service.temp_dir, 'timeline.mp4'))
+    results['timeline'] = (time.time() - started, files_written_since(service.temp_dir, started))
+
+    print(f"Rendered {len(segment_media)} segments")
+    for mode, (seconds, written) in results.items():
+        print(f"{mode:>12}: {seconds:8.2f} s  {written / (1024 * 1024):8.2f} MiB written")
+
+
+def probe_frame_rate(video_path):
+    """Delivered video frame rate ('25/1' style) reported by ffprobe, or '?'"""
+    cmd = [
+        'ffprobe', '-v', 'quiet', '-select_streams', 'v:0',
+        '-show_entries', 'stream=avg_frame_rate',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        video_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError:
+        return '?'
+    return result.stdout.strip() or '?'
+
+
+def bench_encode(sentences):
+    """Compare encode time and output size of each encode profile"""
+    service = OfflineAIService()
+    script = '. '.join(f"{SAMPLE_SENTENCE} {i}" for i in range(sentences))
+
+    segment_media = []
+    for segment in service.split_script(script):
+        audio_path = service.generate_speech_offline(segment)
+        image_path = service.generate_image_offline(segment)
+        segment_media.append((image_path, audio_path))
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # The timeline encoder backs combine_media_to_video and the advanced scene pipeline
+        narration = assemble_narration([audio_path for _, audio_path in segment_media], os.path.join(scratch, 'narration.wav'))
+
+        print(f"{len(segment_media)} segments, {narration.duration:.1f} s of narration")
+        for profile in ENCODE_PROFILES:
+            started = time.time()
+            segment_paths = [
+                service.create_video_segment(image_path, audio_path, f'{profile}_{i}', scratch, profile)
+                for i, (image_path, audio_path) in enumerate(segment_media)
+            ]
+            segment_seconds = time.time() - started
+            segment_bytes = sum(os.path.getsize(path) for path in segment_paths if os.path.exists(path))
+
+            timeline_path = os.path.join(scratch, f'timeline_{profile}.mp4')
+            started = time.time()
+            encode_timeline([image_path for image_path, _ in segment_media], narration, timeline_path, encode_profile=profile)
+            timeline_seconds = time.time() - started
+            timeline_bytes = os.path.getsize(timeline_path) if os.path.exists(timeline_path) else 0
+
+            # Every profile must deliver the job's frame rate; only the source rate differs
+            segment_fps = probe_frame_rate(segment_paths[0]) if segment_paths else '?'
+            timeline_fps = probe_frame_rate(timeline_path) if timeline_bytes else '?'
+            print(f"{profile:>8} segments: {segment_seconds:8.2f} s  {segment_bytes / (1024 * 1024):8.2f} MiB  {segment_fps} fps")
+            print(f"{profile:>8} timeline: {timeline_seconds:8.2f} s  {timeline_bytes / (1024 * 1024):8.2f} MiB  {timeline_fps} fps")
+
+
+def bench_parallel(sentences, max_workers):
+    """Compare sequential and process-pool segment rendering end to end"""
+    service = OfflineAIService()
+    script = '. '.join(f"{SAMPLE_SENTENCE} {i}" for i in range(sentences))
+
+    for label, options in [
+        ('sequential', {}),
+        ('parallel', {'parallel': True, 'max_workers': max_workers}),
+    ]:
+        started = time.time()
+        service.generate_video_offline(script, options=options)
+        print(f"{label:>12}: {time.time() - started:8.2f} s")
+
+
+def legacy_synthetic_speech(text, output_path):
+    """Per-sample reference implementation the vectorized generator must match"""
+    sample_rate = 22050
+    frames = []
+    for char in text:
+        if char.isalpha():
+            freq = 200 + (ord(char.lower()) - ord('a')) * 20
+            for j in range(int(sample_rate * 0.1)):
+                value = int(32767 * 0.3 * math.sin(2 * math.pi * freq * j / sample_rate))
+                frames.append(struct.pack('<h', value))
+        else:
+            for j in range(int(sample_rate * 0.05)):
+                frames.append(struct.pack('<h', 0))
+
+    with wave.open(output_path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b''.join(frames))
+    return output_path
+
+
+def bench_speech(characters):
+    """Compare the per-sample and vectorized synthetic speech generators"""
+    service = OfflineAIService()
+    text = (SAMPLE_SENTENCE + '. ') * (characters // (len(SAMPLE_SENTENCE) + 2) + 1)
+    text = text[:characters]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        legacy_path = os.path.join(scratch, 'legacy.wav')
+        vectorized_path = os.path.join(scratch, 'vectorized.wav')
+
+        started = time.time()
+        legacy_synthetic_speech(text, legacy_path)
+        legacy_seconds = time.time() - started
+
+        started = time.time()
+        service.generate_synthetic_speech(text, vectorized_path)
+        vectorized_seconds = time.time() - started
+
+        with open(legacy_path, 'rb') as legacy, open(vectorized_path, 'rb') as vectorized:
+            identical = legacy.read() == vectorized.read()
+
+    print(f"{len(text)} characters")
+    print(f"{'legacy':>12}: {legacy_seconds:8.3f} s")
+    print(f"{'vectorized':>12}: {vectorized_seconds:8.3f} s  ({legacy_seconds / max(vectorized_seconds, 1e-9):.0f}x)")
+    print(f"{'identical':>12}: {identical}")
+
+
+def measure_import(module):
+    """Import `module` in a fresh interpreter under -X importtime; returns (cumulative us, entries)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((int(self_us), int(cumulative_us), name.strip()))
+
+    total = next((cumulative for _, cumulative, name in entries if name == module), 0)
+    return total, entries
+
+
+def bench_importtime(modules, budget_ms, top):
+    """Report cold import cost per module; exits non-zero if any exceeds the budget"""
+    over_budget = []
+    for module in modules:
+        try:
+            total, entries = measure_import(module)
+        except RuntimeError as e:
+            print(f"{module}: import failed ({e})")
+            over_budget.append(module)
+            continue
+
+        print(f"{module}: {total / 1000:8.1f} ms")
+        for self_us, _, name in sorted(entries, reverse=True)[:top]:
+            print(f"    {self_us / 1000:8.1f} ms  {name}")
+
+        if budget_ms is not None and total / 1000 > budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over {budget_ms} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    render_parser = subparsers.add_parser('render', help='segment vs single-pass vs timeline offline render')
+    render_parser.add_argument('--sentences', type=int, default=40)
+
+    parallel_parser = subparsers.add_parser('parallel', help='sequential vs process-pool segment rendering')
+    parallel_parser.add_argument('--sentences', type=int, default=40)
+    parallel_parser.add_argument('--max-workers', type=int, default=None)
+
+    speech_parser = subparsers.add_parser('speech', help='per-sample vs vectorized synthetic speech')
+    speech_parser.add_argument('--characters', type=int, default=2000)
+
+    encode_parser = subparsers.add_parser('encode', help='default vs still-image encode profile')
+    encode_parser.add_argument('--sentences', type=int, default=20)
+
+    importtime_parser = subparsers.add_parser('importtime', help='cold import cost of service modules')
+    importtime_parser.add_argument('modules', nargs='*', default=IMPORT_TIME_MODULES)
+    importtime_parser.add_argument('--budget-ms', type=float, default=None)
+    importtime_parser.add_argument('--top', type=int, default=5, help='slowest imports to list per module')
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'render':
+        bench_render(args.sentences)
+    elif args.benchmark == 'parallel':
+        bench_parallel(args.sentences, args.max_workers)
+    elif args.benchmark == 'speech':
+        bench_speech(args.characters)
+    elif args.benchmark == 'encode':
+        bench_encode(args.sentences)
+    elif args.benchmark == 'importtime':
+        bench_importtime(args.modules, args.budget_ms, args.top)
+
+
+if __name__ == '__main__':
+    main()
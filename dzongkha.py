@@ -5,12 +5,12 @@ import uuid
 import json
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from src.services.dzongkha_service import DzongkhaService
+from src.services.service_registry import services
 
 dzongkha_bp = Blueprint('dzongkha', __name__)
 
-# Initialize Dzongkha service
-dzongkha_service = DzongkhaService()
+# Dzongkha service is built on first use by the shared registry
+dzongkha_service = services.proxy('dzongkha')
 
 @dzongkha_bp.route('/dzongkha/capabilities', methods=['GET'])
 @cross_origin()
@@ -273,6 +273,7 @@ def test_dzongkha_integration():
         # Test TTS (if available)
         tts_result = None
         try:
+            dzongkha_service.ensure_models_loaded()
             if dzongkha_service.tts_available:
                 audio_path = dzongkha_service.text_to_speech_dzongkha(test_text)
                 tts_result = {"status": "success", "audio_generated": os.path.exists(audio_path)}
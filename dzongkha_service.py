@@ -4,13 +4,26 @@ import tempfile
 import requests
 import json
 from datetime import datetime
-import torch
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-import librosa
-import soundfile as sf
 import numpy as np
 import sqlite3
+import threading
+import wave
+from functools import lru_cache
 from pathlib import Path
+from src.services.media_cache import tts_cache
+
+# Synthetic Dzongkha voice parameters
+SYNTHETIC_SAMPLE_RATE = 22050
+SYNTHETIC_BASE_FREQ = 180  # Lower base frequency for Dzongkha
+SYNTHETIC_CHAR_SAMPLES = int(SYNTHETIC_SAMPLE_RATE * 0.15)
+SYNTHETIC_SPACE_SAMPLES = int(SYNTHETIC_SAMPLE_RATE * 0.1)
+
+# Engine settings that change the synthesized audio; part of the TTS cache key
+TTS_ENGINE_SETTINGS = {
+    'mms': {'model_version': 'facebook/mms-tts-dzo', 'sample_rate': 16000},
+    'espeak': {'model_version': 'espeak-dz-s150-p50', 'sample_rate': 22050},
+    'synthetic': {'model_version': 'synthetic-dzongkha-v1', 'sample_rate': SYNTHETIC_SAMPLE_RATE}
+}
 
 class DzongkhaService:
     def __init__(self):
@@ -22,7 +35,10 @@ class DzongkhaService:
         os.makedirs(self.models_dir, exist_ok=True)
         
         self.init_database()
-        self.load_models()
+        
+        # Models are loaded on first use, not at construction
+        self.models_loaded = False
+        self._models_lock = threading.Lock()
     
     def init_database(self):
         """Initialize database for Dzongkha language data"""
@@ -64,6 +80,15 @@ class DzongkhaService:
         conn.commit()
         conn.close()
     
+    def ensure_models_loaded(self):
+        """Load models once, on the first call that needs them"""
+        if self.models_loaded:
+            return
+        with self._models_lock:
+            if not self.models_loaded:
+                self.load_models()
+                self.models_loaded = True
+    
     def load_models(self):
         """Load Dzongkha language models"""
         try:
@@ -155,11 +180,23 @@ class DzongkhaService:
     
     def text_to_speech_dzongkha(self, text, output_path=None):
         """Convert Dzongkha text to speech"""
+        try:
+            self.ensure_models_loaded()
+        except Exception as e:
+            print(f"Model loading failed: {e}")
+        
+        use_model = hasattr(self, 'tts_model') and self.tts_available
+        engine = 'mms' if use_model else getattr(self, 'tts_engine', 'synthetic')
+        cache_key = self.speech_cache_key(text, engine)
+        
         if output_path is None:
-            output_path = os.path.join(self.temp_dir, f'dzongkha_tts_{hash(text)}.wav')
+            output_path = os.path.join(self.temp_dir, f'dzongkha_tts_{cache_key[:16]}.wav')
+        
+        if tts_cache.fetch(cache_key, output_path):
+            return output_path
         
         try:
-            if hasattr(self, 'tts_model') and self.tts_available:
+            if use_model:
                 return self.generate_tts_with_model(text, output_path)
             else:
                 return self.generate_tts_fallback(text, output_path)
@@ -168,9 +205,24 @@ class DzongkhaService:
             print(f"TTS generation failed: {e}")
             return self.generate_synthetic_dzongkha_speech(text, output_path)
     
+    def speech_cache_key(self, text, engine):
+        """Stable TTS cache key for this text and engine"""
+        settings = TTS_ENGINE_SETTINGS[engine]
+        return tts_cache.make_key(
+            text=text,
+            voice_id='dzongkha',
+            engine=engine,
+            model_version=settings['model_version'],
+            sample_rate=settings['sample_rate']
+        )
+    
     def generate_tts_with_model(self, text, output_path):
         """Generate TTS using the loaded model"""
         try:
+            # Only needed once the MMS model is loaded, so imported here
+            import torch
+            import soundfile as sf
+            
             # Tokenize the text
             inputs = self.tts_tokenizer(text, return_tensors="pt")
             
@@ -185,6 +237,7 @@ class DzongkhaService:
             sample_rate = 16000
             sf.write(output_path, audio_np, sample_rate)
             
+            tts_cache.put(self.speech_cache_key(text, 'mms'), output_path)
             return output_path
             
         except Exception as e:
@@ -199,77 +252,44 @@ class DzongkhaService:
                 '-w', output_path, text
             ]
             subprocess.run(cmd, check=True, capture_output=True)
+            tts_cache.put(self.speech_cache_key(text, 'espeak'), output_path)
             return output_path
         else:
             return self.generate_synthetic_dzongkha_speech(text, output_path)
     
     def generate_synthetic_dzongkha_speech(self, text, output_path):
         """Generate synthetic speech for Dzongkha text"""
-        # Create a simple tone-based representation
-        sample_rate = 22050
-        duration = len(text) * 0.15  # Slightly longer for Dzongkha
-        
-        # Generate tone sequence with Dzongkha-like characteristics
-        frames = []
-        
-        # Dzongkha has tonal characteristics, simulate with varying frequencies
-        base_freq = 180  # Lower base frequency for Dzongkha
-        
-        for i, char in enumerate(text):
-            if char.strip():  # Non-whitespace character
-                # Generate tone based on character position and Unicode value
-                char_code = ord(char)
-                
-                # Simulate tonal variation (Dzongkha is tonal)
-                if char_code >= 0x0F00 and char_code <= 0x0FFF:  # Tibetan script range
-                    # High tone
-                    freq = base_freq + (char_code % 100) + 50
-                    tone_type = 'high'
-                elif char_code >= 0x0F40 and char_code <= 0x0F6C:  # Dzongkha consonants
-                    # Mid tone
-                    freq = base_freq + (char_code % 50) + 25
-                    tone_type = 'mid'
-                else:
-                    # Low tone
-                    freq = base_freq + (char_code % 30)
-                    tone_type = 'low'
-                
-                # Generate sound for character
-                char_duration = 0.15
-                for j in range(int(sample_rate * char_duration)):
-                    t = j / sample_rate
-                    
-                    # Add harmonic complexity for more natural sound
-                    value = 0
-                    value += 0.6 * np.sin(2 * np.pi * freq * t)  # Fundamental
-                    value += 0.2 * np.sin(2 * np.pi * freq * 2 * t)  # Second harmonic
-                    value += 0.1 * np.sin(2 * np.pi * freq * 3 * t)  # Third harmonic
-                    
-                    # Add envelope for natural attack/decay
-                    envelope = np.exp(-t * 3) if tone_type == 'high' else np.exp(-t * 2)
-                    value *= envelope * 0.3
-                    
-                    frames.append(int(32767 * value))
-            else:
-                # Silence for whitespace
-                for j in range(int(sample_rate * 0.1)):
-                    frames.append(0)
-        
-        # Write WAV file
-        import wave
-        import struct
-        
         with wave.open(output_path, 'wb') as wav_file:
             wav_file.setnchannels(1)
             wav_file.setsampwidth(2)
-            wav_file.setframerate(sample_rate)
-            wav_file.writeframes(b''.join(struct.pack('<h', frame) for frame in frames))
+            wav_file.setframerate(SYNTHETIC_SAMPLE_RATE)
+            for chunk in self.iter_synthetic_dzongkha_pcm(text):
+                wav_file.writeframes(chunk)
         
+        tts_cache.put(self.speech_cache_key(text, 'synthetic'), output_path)
         return output_path
     
+    def iter_synthetic_dzongkha_pcm(self, text, chars_per_chunk=256):
+        """
+        Yield synthetic Dzongkha speech as 16-bit mono PCM chunks
+        (SYNTHETIC_SAMPLE_RATE Hz), so long texts never build one giant buffer
+        """
+        silence = _synthetic_silence()
+        
+        for start in range(0, len(text), chars_per_chunk):
+            chunk = []
+            for char in text[start:start + chars_per_chunk]:
+                if char.strip():  # Non-whitespace character
+                    chunk.append(_synthetic_dzongkha_tone(*_dzongkha_char_tone(char)))
+                else:
+                    # Silence for whitespace
+                    chunk.append(silence)
+            yield np.concatenate(chunk).tobytes()
+    
     def speech_to_text_dzongkha(self, audio_path):
         """Convert Dzongkha speech to text"""
         try:
+            self.ensure_models_loaded()
             if hasattr(self, 'asr_model') and self.asr_available:
                 return self.transcribe_with_model(audio_path)
             else:
@@ -314,6 +334,7 @@ class DzongkhaService:
     def translate_text(self, text, source_lang='dz', target_lang='en'):
         """Translate text between Dzongkha and English"""
         try:
+            self.ensure_models_loaded()
             if self.translation_available:
                 return self.translate_with_model(text, source_lang, target_lang)
             else:
@@ -444,6 +465,7 @@ class DzongkhaService:
             "translation_available": getattr(self, 'translation_available', False),
             "text_validation": True,
             "language_detection": True,
+            "models_initialized": self.models_loaded,
             "models_loaded": {
                 "tts_model": hasattr(self, 'tts_model'),
                 "asr_model": hasattr(self, 'asr_model'),
@@ -451,3 +473,54 @@ class DzongkhaService:
             }
         }
 
+
+def _dzongkha_char_tone(char):
+    """Map a character to its (frequency, tone class)"""
+    # Generate tone based on Unicode value
+    char_code = ord(char)
+    
+    # Simulate tonal variation (Dzongkha is tonal)
+    if char_code >= 0x0F00 and char_code <= 0x0FFF:  # Tibetan script range
+        # High tone
+        return SYNTHETIC_BASE_FREQ + (char_code % 100) + 50, 'high'
+    elif char_code >= 0x0F40 and char_code <= 0x0F6C:  # Dzongkha consonants
+        # Mid tone
+        return SYNTHETIC_BASE_FREQ + (char_code % 50) + 25, 'mid'
+    else:
+        # Low tone
+        return SYNTHETIC_BASE_FREQ + (char_code % 30), 'low'
+
+
+@lru_cache(maxsize=None)
+def _synthetic_time_axis():
+    return np.arange(SYNTHETIC_CHAR_SAMPLES) / SYNTHETIC_SAMPLE_RATE
+
+
+@lru_cache(maxsize=None)
+def _synthetic_envelope(tone_type):
+    """Attack/decay envelope, computed once per tone class"""
+    t = _synthetic_time_axis()
+    return np.exp(-t * 3) if tone_type == 'high' else np.exp(-t * 2)
+
+
+@lru_cache(maxsize=None)
+def _synthetic_silence():
+    return np.zeros(SYNTHETIC_SPACE_SAMPLES, dtype='<i2')
+
+
+@lru_cache(maxsize=512)
+def _synthetic_dzongkha_tone(freq, tone_type):
+    """Render one character's tone as int16 samples; cached per (frequency, tone class)"""
+    t = _synthetic_time_axis()
+    
+    # Add harmonic complexity for more natural sound
+    value = 0.6 * np.sin(2 * np.pi * freq * t)  # Fundamental
+    value += 0.2 * np.sin(2 * np.pi * freq * 2 * t)  # Second harmonic
+    value += 0.1 * np.sin(2 * np.pi * freq * 3 * t)  # Third harmonic
+    
+    # Add envelope for natural attack/decay
+    value *= _synthetic_envelope(tone_type) * 0.3
+    
+    tone = (32767 * value).astype('<i2')  # truncates like int()
+    tone.flags.writeable = False
+    return tone
@@ -0,0 +1,58 @@
+import os
+
+# Still-image profile: slides change only at segment boundaries, so the filter
+# chain runs at a low source rate; the output is retimed to the job's frame rate
+# and x264 codes the repeated frames as skip blocks
+STILL_SOURCE_FPS = int(os.getenv('STILL_SOURCE_FPS', '5'))
+STILL_GOP_SECONDS = int(os.getenv('STILL_GOP_SECONDS', '10'))
+
+# Preview profile: a quick low-resolution look before the full render
+PREVIEW_RESOLUTION = os.getenv('PREVIEW_RESOLUTION', '640x360')
+PREVIEW_FPS = int(os.getenv('PREVIEW_FPS', '10'))
+
+ENCODE_PROFILES = {
+    # Previous behaviour: libx264 defaults at the job's frame rate
+    'default': {
+        'source_fps': None,
+        'args': ['-c:v', 'libx264']
+    },
+    'still': {
+        'source_fps': STILL_SOURCE_FPS,
+        'args': ['-c:v', 'libx264', '-preset', 'veryfast', '-tune', 'stillimage']
+    },
+    'preview': {
+        'source_fps': PREVIEW_FPS,
+        'resolution': PREVIEW_RESOLUTION,
+        'args': ['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'stillimage']
+    }
+}
+
+
+def get_encode_profile(name):
+    """Look up an encode profile, falling back to 'default' for unknown names"""
+    return ENCODE_PROFILES.get(name or 'default', ENCODE_PROFILES['default'])
+
+
+def encode_fps(name, fps):
+    """Source frame rate fed to ffmpeg for a job at `fps` under profile `name`"""
+    source_fps = get_encode_profile(name)['source_fps']
+    return min(source_fps, fps) if source_fps else fps
+
+
+def encode_resolution(name, resolution='1280x720'):
+    """Output resolution ('WxH') for `resolution` under profile `name`"""
+    return get_encode_profile(name).get('resolution') or resolution
+
+
+def video_encoder_args(name, fps):
+    """
+    libx264 output arguments for profile `name` and job frame rate `fps`.
+    Low-rate profiles are retimed from their source rate to `fps` on output,
+    with one keyframe every STILL_GOP_SECONDS and no scene-cut keyframes, so a
+    still segment costs one I-frame and a run of skip-coded duplicates.
+    """
+    profile = get_encode_profile(name)
+    args = list(profile['args'])
+    if profile['source_fps']:
+        args += ['-g', str(fps * STILL_GOP_SECONDS), '-sc_threshold', '0', '-r', str(fps)]
+    return args
@@ -0,0 +1,112 @@
+import subprocess
+import tempfile
+import numpy as np
+
+
+class FrameSink:
+    """
+    One long-lived ffmpeg process fed raw RGB frames over stdin.
+    Stills are converted to bytes once and the same memoryview is written for
+    every frame they are shown, so intermediates never touch PNG or disk.
+    """
+
+    def __init__(self, output_path, size=(1280, 720), fps=25, audio_path=None, encoder_args=None):
+        self.output_path = output_path
+        self.size = size
+        self.fps = fps
+        self.audio_path = audio_path
+        self.encoder_args = encoder_args or ['-c:v', 'libx264']
+        self.process = None
+        self.stderr = None
+        self.frames_written = 0
+        self.timeline = 0.0  # Seconds of stills requested so far
+
+    def start(self):
+        width, height = self.size
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', f'{width}x{height}', '-framerate', str(self.fps),
+            '-i', '-'
+        ]
+        if self.audio_path:
+            cmd += ['-i', self.audio_path, '-map', '0:v', '-map', '1:a', '-c:a', 'aac']
+        cmd += self.encoder_args + ['-pix_fmt', 'yuv420p', self.output_path]
+
+        # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr)
+        return self
+
+    def frame_buffer(self, frame):
+        """memoryview over packed RGB bytes for a Pillow image or HxWx3 uint8 array"""
+        if isinstance(frame, np.ndarray):
+            if frame.shape != (self.size[1], self.size[0], 3) or frame.dtype != np.uint8:
+                raise ValueError(f"Expected a {self.size[1]}x{self.size[0]}x3 uint8 frame, got {frame.shape} {frame.dtype}")
+            # Zero-copy when the array is already contiguous
+            return memoryview(np.ascontiguousarray(frame)).cast('B')
+
+        if frame.mode != 'RGB':
+            frame = frame.convert('RGB')
+        if frame.size != tuple(self.size):
+            frame = frame.resize(self.size)
+        return memoryview(frame.tobytes())
+
+    def write_frame(self, frame, count=1):
+        """Write `frame` `count` times"""
+        buffer = frame if isinstance(frame, memoryview) else self.frame_buffer(frame)
+        try:
+            for _ in range(count):
+                self.process.stdin.write(buffer)
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"ffmpeg stopped accepting frames: {self._error_output() or e}")
+        self.frames_written += count
+
+    def write_still(self, frame, duration):
+        """
+        Show `frame` for `duration` seconds. The end time is snapped to whole
+        frames against the running total, so long timelines never drift.
+        """
+        self.timeline += duration
+        count = round(self.timeline * self.fps) - self.frames_written
+        if count > 0:
+            self.write_frame(frame, count)
+        return count
+
+    def close(self):
+        """Finish the encode; returns the output path, or None if ffmpeg failed"""
+        if self.process is None:
+            return None
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        returncode = self.process.wait()
+        error_output = self._error_output()
+        self.stderr.close()
+        self.process = None
+
+        if returncode != 0:
+            print(f"Frame sink encode failed: {error_output[-2000:]}")
+            return None
+        return self.output_path
+
+    def abort(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.stderr.close()
+            self.process = None
+
+    def _error_output(self):
+        self.stderr.seek(0)
+        return self.stderr.read().decode(errors='replace')
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        elif self.process is not None:
+            self.close()
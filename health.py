@@ -0,0 +1,58 @@
+from flask import Blueprint, jsonify
+from flask_cors import cross_origin
+from src.services.service_registry import services
+from src.services.rate_limiter import provider_limits
+from src.services.provider_health import provider_health
+from src.services.media_cache import image_cache, render_cache, tts_cache
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/health/live', methods=['GET'])
+@cross_origin()
+def liveness():
+    """Report that the HTTP server is answering"""
+    return jsonify({'status': 'ok'})
+
+@health_bp.route('/health/ready', methods=['GET'])
+@cross_origin()
+def readiness():
+    """Report which services and models are loaded"""
+    try:
+        return jsonify(services.get_status())
+    except Exception as e:
+        print(f"Readiness check error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@health_bp.route('/health/rate-limits', methods=['GET'])
+@cross_origin()
+def rate_limits():
+    """Report per-provider concurrency and rate limiter state"""
+    try:
+        return jsonify({'providers': provider_limits.get_status()})
+    except Exception as e:
+        print(f"Rate limit status error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@health_bp.route('/health/providers', methods=['GET'])
+@cross_origin()
+def provider_circuits():
+    """Report circuit breaker state for each remote provider"""
+    try:
+        return jsonify({'providers': provider_health.get_status()})
+    except Exception as e:
+        print(f"Provider health status error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@health_bp.route('/health/caches', methods=['GET'])
+@cross_origin()
+def cache_stats():
+    """Report hit/miss statistics for the media caches"""
+    try:
+        return jsonify({
+            'images': image_cache.get_stats(),
+            'segments': render_cache.get_stats(),
+            'tts': tts_cache.get_stats()
+        })
+    except Exception as e:
+        print(f"Cache stats error: {e}")
+        return jsonify({'error': str(e)}), 500
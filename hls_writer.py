@@ -0,0 +1,110 @@
+import math
+import os
+import subprocess
+import threading
+
+PLAYLIST_NAME = 'playlist.m3u8'
+HLS_TARGET_DURATION = int(os.getenv('HLS_TARGET_DURATION', '10'))
+# Finished streams are only needed while clients play them; the MP4 is kept separately
+HLS_STREAM_MAX_AGE = int(os.getenv('HLS_STREAM_MAX_AGE', '3600'))
+
+
+class HLSPlaylistWriter:
+    """
+    Live (EVENT) HLS playlist for a render in progress. Each script segment is
+    encoded to MPEG-TS files of at most target_duration seconds with
+    -output_ts_offset, so timestamps run on continuously, and each file is
+    listed as soon as it exists. Players can start on the first one while
+    later ones are still rendering. EXT-X-TARGETDURATION never changes.
+    """
+
+    def __init__(self, output_dir, target_duration=HLS_TARGET_DURATION):
+        self.output_dir = output_dir
+        self.target_duration = target_duration
+        self.segments = []  # [(filename, duration), ...]
+        self.offset = 0.0
+        self.finished = False
+        self.lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+        self._write_playlist()
+
+    @property
+    def playlist_path(self):
+        return os.path.join(self.output_dir, PLAYLIST_NAME)
+
+    def encode_segment(self, image_path, audio_path, duration, encoder_args, fps=25, resolution='1280x720'):
+        """
+        Encode one still + narration pair at the current offset and publish it.
+        Narration longer than the target duration is split into equal chunks.
+        Returns the published file paths.
+        """
+        chunks = max(1, math.ceil(duration / self.target_duration))
+        chunk_duration = duration / chunks
+        return [
+            self._encode_chunk(
+                image_path, audio_path, i * chunk_duration, chunk_duration,
+                encoder_args, fps, resolution
+            )
+            for i in range(chunks)
+        ]
+
+    def _encode_chunk(self, image_path, audio_path, start, duration, encoder_args, fps, resolution):
+        index = len(self.segments)
+        filename = f'segment_{index:05d}.ts'
+        output_path = os.path.join(self.output_dir, filename)
+
+        cmd = [
+            'ffmpeg', '-y',
+            '-loop', '1', '-framerate', str(fps), '-i', image_path,
+            '-ss', f'{start:.3f}', '-i', audio_path,
+            '-t', f'{duration:.3f}'
+        ] + encoder_args + [
+            '-c:a', 'aac',
+            '-pix_fmt', 'yuv420p',
+            '-vf', f"scale={resolution.replace('x', ':')}",
+            '-output_ts_offset', f'{self.offset:.3f}',
+            '-f', 'mpegts', output_path + '.part'
+        ]
+
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"HLS segment {index} encode failed: {result.stderr[-2000:]}")
+
+        # Only complete files are ever listed
+        os.replace(output_path + '.part', output_path)
+        self.add_segment(filename, duration)
+        return output_path
+
+    def add_segment(self, filename, duration):
+        with self.lock:
+            self.segments.append((filename, duration))
+            self.offset += duration
+            self._write_playlist()
+
+    def finish(self):
+        """Mark the playlist complete so players stop polling"""
+        with self.lock:
+            self.finished = True
+            self._write_playlist()
+        return self.playlist_path
+
+    def _write_playlist(self):
+        # Fixed for the life of the stream (RFC 8216); chunking keeps every segment within it
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            '#EXT-X-PLAYLIST-TYPE:EVENT',
+            f'#EXT-X-TARGETDURATION:{self.target_duration}',
+            '#EXT-X-MEDIA-SEQUENCE:0'
+        ]
+        for filename, duration in self.segments:
+            lines.append(f'#EXTINF:{duration:.3f},')
+            lines.append(filename)
+        if self.finished:
+            lines.append('#EXT-X-ENDLIST')
+
+        # Write beside the playlist and rename so readers never see a partial file
+        tmp_path = self.playlist_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.playlist_path)
@@ -0,0 +1,54 @@
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class MediaDownloader:
+    """Connection-pooled client that streams remote media straight to disk"""
+
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None, retries=None, chunk_size=64 * 1024):
+        self.pool_size = pool_size or int(os.getenv('MEDIA_DOWNLOAD_POOL_SIZE', '16'))
+        self.timeout = (
+            connect_timeout or float(os.getenv('MEDIA_DOWNLOAD_CONNECT_TIMEOUT', '5')),
+            read_timeout or float(os.getenv('MEDIA_DOWNLOAD_READ_TIMEOUT', '60'))
+        )
+        self.chunk_size = chunk_size
+
+        retries = retries if retries is not None else int(os.getenv('MEDIA_DOWNLOAD_RETRIES', '3'))
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD'])
+        )
+
+        # Connections (and TLS sessions) are reused across downloads and threads
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def download(self, url, output_path):
+        """Stream `url` to `output_path` in chunks; the file appears only when complete"""
+        partial_path = f"{output_path}.part"
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Failed to download media: {response.status_code}")
+
+                with open(partial_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if chunk:
+                            f.write(chunk)
+
+            os.replace(partial_path, output_path)
+            return output_path
+
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+
+# Shared by every service that fetches remote media
+media_downloader = MediaDownloader()
@@ -1,46 +1,99 @@
 import os
+import hashlib
+import shutil
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from openai import OpenAI
 import tempfile
-import subprocess
+import time
+import numpy as np
+from PIL import Image, ImageDraw
+from src.services.rate_limiter import provider_limits
+from src.services.http_client import media_downloader
+from src.services.provider_health import provider_health
+from src.services.text_layout import load_font, wrap_text
+from src.services.media_cache import image_cache, image_cache_key
+
+# Per-request timeout for OpenAI calls; the SDK default waits up to 10 minutes
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+
+# Parallel prompts per batch; the openai_images limiter still caps in-flight calls
+IMAGE_BATCH_WORKERS = int(os.getenv('IMAGE_BATCH_WORKERS', '4'))
+
+FALLBACK_IMAGE_SIZE = (1280, 720)
+FALLBACK_LINE_HEIGHT = 60
+FALLBACK_MAX_LINES = 10
+
+# Fallback backgrounds come from a fixed palette so every gradient is built once
+FALLBACK_PALETTE = [
+    (37, 99, 235), (22, 163, 74), (124, 58, 237), (220, 38, 38),
+    (234, 88, 12), (13, 148, 136), (219, 39, 119), (71, 85, 105),
+    (202, 138, 4), (79, 70, 229), (8, 145, 178), (101, 163, 13)
+]
+
+
+def fallback_color(text_prompt):
+    """Palette color picked by a stable digest of the prompt"""
+    digest = hashlib.sha256(text_prompt.encode('utf-8')).digest()
+    return FALLBACK_PALETTE[digest[0] % len(FALLBACK_PALETTE)]
+
+
+@lru_cache(maxsize=len(FALLBACK_PALETTE))
+def _fallback_background(color):
+    """Vertical gradient from `color` to half its brightness, built once per color"""
+    width, height = FALLBACK_IMAGE_SIZE
+    ratio = np.linspace(1.0, 0.5, height, dtype=np.float32)[:, None]
+    column = (ratio * np.array(color, dtype=np.float32)).astype(np.uint8)
+    pixels = np.broadcast_to(column[:, None, :], (height, width, 3))
+    return Image.fromarray(np.ascontiguousarray(pixels), 'RGB')
 
 class ImageGenerationService:
     def __init__(self):
         # Initialize OpenAI client for DALL-E
-        self.openai_client = OpenAI()
+        self.openai_client = OpenAI(timeout=OPENAI_TIMEOUT)
+        provider_health.register_probe('openai_images', self.openai_client.models.list)
     
-    def generate_image_from_text(self, text_prompt, output_path, style="realistic"):
+    def generate_image_from_text(self, text_prompt, output_path, style="realistic", use_cache=True):
         """
         Generate an image from text description
         """
         try:
-            # Enhance the prompt based on style
-            enhanced_prompt = self._enhance_prompt(text_prompt, style)
-            
-            # Generate image using DALL-E
-            response = self.openai_client.images.generate(
-                model="dall-e-3",
-                prompt=enhanced_prompt,
-                size="1280x720",  # 16:9 aspect ratio for video
-                quality="standard",
-                n=1
-            )
-            
-            # Download the generated image
-            image_url = response.data[0].url
-            image_response = requests.get(image_url)
-            
-            if image_response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    f.write(image_response.content)
-                return output_path
-            else:
-                raise Exception(f"Failed to download image: {image_response.status_code}")
-                
+            return self._generate_with_dalle(text_prompt, output_path, style, use_cache)
         except Exception as e:
             print(f"DALL-E image generation failed: {e}")
             return self._generate_fallback_image(text_prompt, output_path)
     
+    def _generate_with_dalle(self, text_prompt, output_path, style, use_cache=True):
+        """Generate an image with DALL-E; raises on failure"""
+        # Enhance the prompt based on style
+        enhanced_prompt = self._enhance_prompt(text_prompt, style)
+        
+        # Repeated prompts are served from disk instead of a new paid generation
+        cache_key = image_cache_key(enhanced_prompt, style, "1280x720", "dall-e-3", "standard")
+        if use_cache and image_cache.fetch(cache_key, output_path):
+            return output_path
+        
+        # Generate image using DALL-E
+        def request_image():
+            with provider_limits.slot('openai_images'):
+                return self.openai_client.images.generate(
+                    model="dall-e-3",
+                    prompt=enhanced_prompt,
+                    size="1280x720",  # 16:9 aspect ratio for video
+                    quality="standard",
+                    n=1
+                )
+        
+        # Fails fast with CircuitOpenError while DALL-E is unhealthy
+        response = provider_health.call('openai_images', request_image)
+        
+        # Download the generated image over the shared connection pool
+        image_url = response.data[0].url
+        media_downloader.download(image_url, output_path)
+        image_cache.put(cache_key, output_path)
+        return output_path
+    
     def _enhance_prompt(self, text_prompt, style):
         """Enhance the text prompt for better image generation"""
         style_modifiers = {
@@ -61,52 +114,103 @@ class ImageGenerationService:
         return enhanced_prompt
     
     def _generate_fallback_image(self, text_prompt, output_path):
-        """Generate a simple colored image as fallback"""
+        """Render a gradient card with the prompt text in-process as fallback"""
         try:
-            # Create a simple gradient image with text overlay
-            # This is a basic fallback - in production you might want to use other services
-            
-            # Generate a colored background based on text hash
-            color_hash = hash(text_prompt) % 16777215  # RGB color range
-            color_hex = f"#{color_hash:06x}"
-            
-            # Create image using FFmpeg
-            subprocess.run([
-                'ffmpeg', '-f', 'lavfi', 
-                '-i', f'color={color_hex}:size=1280x720:duration=1',
-                '-frames:v', '1', '-y', output_path
-            ], check=True, capture_output=True)
+            # Same prompt always gives the same image, so fallbacks stay cacheable
+            img = _fallback_background(fallback_color(text_prompt)).copy()
+            self._draw_prompt_text(img, text_prompt)
+            img.save(output_path, compress_level=1)
             
             return output_path
             
         except Exception as e:
             print(f"Fallback image generation failed: {e}")
             # Last resort: create a black image
-            subprocess.run([
-                'ffmpeg', '-f', 'lavfi', 
-                '-i', 'color=black:size=1280x720:duration=1',
-                '-frames:v', '1', '-y', output_path
-            ], check=True, capture_output=True)
+            Image.new('RGB', FALLBACK_IMAGE_SIZE, 'black').save(output_path)
             
             return output_path
     
+    def _draw_prompt_text(self, img, text):
+        """Centered, shadowed prompt text, matching the offline generator"""
+        draw = ImageDraw.Draw(img)
+        font = load_font()
+        width, height = FALLBACK_IMAGE_SIZE
+        
+        lines = wrap_text(text, font, width - 280)[:FALLBACK_MAX_LINES]
+        y_offset = (height - len(lines) * FALLBACK_LINE_HEIGHT) // 2
+        for i, (line, line_width) in enumerate(lines):
+            x = int((width - line_width) // 2)
+            y = y_offset + i * FALLBACK_LINE_HEIGHT
+            draw.text((x + 2, y + 2), line, fill='black', font=font)
+            draw.text((x, y), line, fill='white', font=font)
+    
     def generate_multiple_images(self, text_segments, output_dir, style="realistic"):
         """Generate multiple images for different text segments"""
-        image_paths = []
+        image_paths = [None] * len(text_segments)
         
-        for i, segment in enumerate(text_segments):
-            output_path = os.path.join(output_dir, f"image_{i:03d}.png")
-            try:
-                generated_path = self.generate_image_from_text(segment, output_path, style)
-                image_paths.append(generated_path)
-            except Exception as e:
-                print(f"Failed to generate image for segment {i}: {e}")
-                # Use fallback
-                fallback_path = self._generate_fallback_image(segment, output_path)
-                image_paths.append(fallback_path)
+        for result in self.generate_images_batch(text_segments, output_dir, style):
+            image_paths[result['index']] = result['path']
         
         return image_paths
     
+    def generate_images_batch(self, prompts, output_dir, style="realistic", max_workers=None, use_cache=True):
+        """
+        Generate one image per prompt with bounded parallelism.
+        Identical prompts are generated once and copied. Yields a result dict per
+        prompt as it completes: index, prompt, status ('completed', 'fallback'
+        or 'failed'), path, error and duration.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Group duplicate prompts so each distinct prompt costs one API call
+        groups = {}
+        for i, prompt in enumerate(prompts):
+            groups.setdefault(prompt.strip(), []).append(i)
+        
+        # Callers may ask for fewer threads than IMAGE_BATCH_WORKERS, never more
+        max_workers = max(1, min(max_workers or IMAGE_BATCH_WORKERS, IMAGE_BATCH_WORKERS, len(groups) or 1))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-batch') as executor:
+            futures = {
+                executor.submit(self._generate_batch_item, prompt, indices[0], output_dir, style, use_cache): (prompt, indices)
+                for prompt, indices in groups.items()
+            }
+            
+            for future in as_completed(futures):
+                prompt, indices = futures[future]
+                result = future.result()
+                yield result
+                
+                for index in indices[1:]:
+                    duplicate = dict(result, index=index, prompt=prompts[index], duplicate_of=result['index'])
+                    if result['path']:
+                        duplicate['path'] = os.path.join(output_dir, f"image_{index:03d}.png")
+                        try:
+                            shutil.copyfile(result['path'], duplicate['path'])
+                        except OSError as e:
+                            duplicate.update(status='failed', path=None, error=str(e))
+                    yield duplicate
+    
+    def _generate_batch_item(self, prompt, index, output_dir, style, use_cache=True):
+        """Generate one batch image, falling back locally when DALL-E fails"""
+        output_path = os.path.join(output_dir, f"image_{index:03d}.png")
+        result = {'index': index, 'prompt': prompt, 'status': 'completed', 'path': None, 'error': None}
+        started = time.monotonic()
+        
+        try:
+            result['path'] = self._generate_with_dalle(prompt, output_path, style, use_cache)
+        except Exception as e:
+            print(f"Failed to generate image for segment {index}: {e}")
+            result['status'] = 'fallback'
+            result['error'] = str(e)
+            try:
+                result['path'] = self._generate_fallback_image(prompt, output_path)
+            except Exception as fallback_error:
+                result['status'] = 'failed'
+                result['error'] = str(fallback_error)
+        
+        result['duration'] = round(time.monotonic() - started, 3)
+        return result
+    
     def create_video_thumbnail(self, title_text, output_path):
         """Create a thumbnail image for the video"""
         try:
@@ -0,0 +1,313 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# Non-terminal jobs whose owner stops refreshing them for this long are reported as interrupted
+JOB_HEARTBEAT_SECONDS = 15
+JOB_STALE_SECONDS = int(os.getenv('VIDEO_JOB_STALE_SECONDS', '90'))
+JOB_RETENTION_DAYS = int(os.getenv('VIDEO_JOB_RETENTION_DAYS', '7'))
+# Suggested client back-off when the queue is full
+JOB_RETRY_AFTER_SECONDS = int(os.getenv('VIDEO_JOB_RETRY_AFTER', '30'))
+
+
+class QueueFullError(Exception):
+    """Raised by submit when VIDEO_JOB_MAX_PENDING jobs are already waiting"""
+
+    def __init__(self, message="Job queue is full, please retry later", retry_after=JOB_RETRY_AFTER_SECONDS):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobQueueService:
+    """
+    Bounded worker pool that runs long render jobs outside the request thread.
+    Job records are mirrored to sqlite (VIDEO_JOB_DB), so any server process,
+    or the same one after a restart, can answer status polls for them.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, max_finished_jobs=500, db_path=None):
+        self.max_workers = max_workers or int(os.getenv('VIDEO_JOB_WORKERS', '2'))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv('VIDEO_JOB_MAX_PENDING', '1000'))
+        self.max_finished_jobs = max_finished_jobs
+        self.db_path = db_path or os.getenv('VIDEO_JOB_DB', '/tmp/video_jobs.db')
+        self.owner = f"{os.uname().nodename}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self.pending = queue.Queue(maxsize=self.max_pending)
+        self.jobs = {}
+        self.finished_order = []
+        self.lock = threading.Lock()
+        # Serializes snapshot-and-write so rows always land in state order
+        self.persist_lock = threading.Lock()
+        self.workers = []
+
+        self.init_database()
+
+    def init_database(self):
+        conn = self.get_db_connection()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT,
+                    stage TEXT,
+                    stages TEXT,
+                    result TEXT,
+                    error TEXT,
+                    metadata TEXT,
+                    created_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    owner TEXT,
+                    heartbeat_at REAL
+                )
+            ''')
+            conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND heartbeat_at < ?",
+                (time.time() - JOB_RETENTION_DAYS * 86400,)
+            )
+        conn.close()
+
+    def get_db_connection(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def start(self):
+        """Start worker threads and the heartbeat (idempotent)"""
+        with self.lock:
+            if self.workers:
+                return
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"video-job-worker-{i}", daemon=True)
+                worker.start()
+                self.workers.append(worker)
+            heartbeat = threading.Thread(target=self._heartbeat_loop, name="video-job-heartbeat", daemon=True)
+            heartbeat.start()
+
+    def submit(self, func, *args, job_id=None, stages=None, metadata=None, **kwargs):
+        """
+        Enqueue a job and return its id immediately.
+        `func` is called as func(*args, progress_callback=..., **kwargs) on a worker thread.
+        """
+        self.start()
+
+        job_id = job_id or str(uuid.uuid4())
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'stage': None,
+            'stages': {stage: {'completed': 0, 'total': 0} for stage in (stages or [])},
+            'result': None,
+            'error': None,
+            'metadata': metadata or {},
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None
+        }
+
+        with self.lock:
+            self.jobs[job_id] = job
+
+        # Recorded before a worker can pick it up, so later states always overwrite it
+        self._persist(job_id)
+        try:
+            self.pending.put_nowait((job_id, func, args, kwargs))
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job_id]
+            self._delete(job_id)
+            raise QueueFullError()
+
+        return job_id
+
+    def update_progress(self, job_id, stage, completed=None, total=None, message=None):
+        """Record per-stage progress for a running job"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job['stage'] = stage
+            stage_info = job['stages'].setdefault(stage, {'completed': 0, 'total': 0})
+            if completed is not None:
+                stage_info['completed'] = completed
+            if total is not None:
+                stage_info['total'] = total
+            if message is not None:
+                stage_info['message'] = message
+        self._persist(job_id)
+
+    def get_job(self, job_id):
+        """Return a snapshot of a job, or None if unknown"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                snapshot = self._snapshot(job)
+                snapshot['queue_position'] = self._queue_position(job_id) if job['status'] == 'queued' else None
+                return snapshot
+
+        # Submitted by another server process, or before a restart
+        return self._load_job(job_id)
+
+    def get_stats(self):
+        """Return this process's queue depth and job counts by status"""
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {
+                'workers': self.max_workers,
+                'pending': self.pending.qsize(),
+                'max_pending': self.max_pending,
+                'jobs': counts
+            }
+
+    def _snapshot(self, job):
+        snapshot = dict(job)
+        snapshot['stages'] = {name: dict(info) for name, info in job['stages'].items()}
+        snapshot['metadata'] = dict(job['metadata'])
+        return snapshot
+
+    def _persist(self, job_id):
+        with self.persist_lock:
+            self._write_job(job_id)
+
+    def _write_job(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job = self._snapshot(job)
+
+        try:
+            conn = self.get_db_connection()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        job['job_id'], job['status'], job['stage'],
+                        json.dumps(job['stages']), json.dumps(job['result'], default=str),
+                        job['error'], json.dumps(job['metadata'], default=str),
+                        job['created_at'], job['started_at'], job['finished_at'],
+                        self.owner, time.time()
+                    )
+                )
+            conn.close()
+        except sqlite3.Error as e:
+            # The in-memory record stays authoritative for this process
+            print(f"Job {job_id} could not be persisted: {e}")
+
+    def _delete(self, job_id):
+        try:
+            with self.persist_lock:
+                conn = self.get_db_connection()
+                with conn:
+                    conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Job {job_id} could not be removed: {e}")
+
+    def _load_job(self, job_id):
+        try:
+            conn = self.get_db_connection()
+            row = conn.execute(
+                'SELECT job_id, status, stage, stages, result, error, metadata, created_at, '
+                'started_at, finished_at, heartbeat_at FROM jobs WHERE job_id = ?',
+                (job_id,)
+            ).fetchone()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Job {job_id} could not be loaded: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        job = {
+            'job_id': row[0],
+            'status': row[1],
+            'stage': row[2],
+            'stages': json.loads(row[3] or '{}'),
+            'result': json.loads(row[4]) if row[4] else None,
+            'error': row[5],
+            'metadata': json.loads(row[6] or '{}'),
+            'created_at': row[7],
+            'started_at': row[8],
+            'finished_at': row[9],
+            'queue_position': None
+        }
+
+        # The owning process refreshes its unfinished jobs; silence means it has gone
+        if job['status'] in ('queued', 'running') and time.time() - row[10] > JOB_STALE_SECONDS:
+            job['status'] = 'failed'
+            job['error'] = 'Job was interrupted by a server restart, please resubmit'
+        return job
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                conn = self.get_db_connection()
+                with conn:
+                    conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                        (time.time(), self.owner)
+                    )
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {e}")
+
+    def _queue_position(self, job_id):
+        # Queue internals are only read for reporting; ordering is FIFO
+        with self.pending.mutex:
+            for position, item in enumerate(self.pending.queue):
+                if item[0] == job_id:
+                    return position + 1
+        return None
+
+    def _worker_loop(self):
+        while True:
+            job_id, func, args, kwargs = self.pending.get()
+            try:
+                self._run_job(job_id, func, args, kwargs)
+            finally:
+                self.pending.task_done()
+
+    def _run_job(self, job_id, func, args, kwargs):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job['status'] = 'running'
+            job['started_at'] = datetime.now().isoformat()
+        self._persist(job_id)
+
+        def progress_callback(stage, completed=None, total=None, message=None):
+            self.update_progress(job_id, stage, completed, total, message)
+
+        try:
+            result = func(*args, progress_callback=progress_callback, **kwargs)
+            self._finish_job(job_id, 'completed', result=result)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._finish_job(job_id, 'failed', error=str(e))
+
+    def _finish_job(self, job_id, status, result=None, error=None):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job['status'] = status
+            job['result'] = result
+            job['error'] = error
+            job['finished_at'] = datetime.now().isoformat()
+        self._persist(job_id)
+
+        with self.lock:
+            # Keep memory bounded by forgetting the oldest finished jobs; sqlite keeps them
+            self.finished_order.append(job_id)
+            while len(self.finished_order) > self.max_finished_jobs:
+                expired = self.finished_order.pop(0)
+                self.jobs.pop(expired, None)
@@ -10,6 +10,8 @@ from src.routes.user import user_bp
 from src.routes.video import video_bp
 from src.routes.offline_video import offline_video_bp
 from src.routes.dzongkha import dzongkha_bp
+from src.routes.health import health_bp
+from src.services.service_registry import in_worker_process, start_warmup_from_env
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -22,13 +24,18 @@ app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(video_bp, url_prefix='/api')
 app.register_blueprint(offline_video_bp, url_prefix='/api/offline')
 app.register_blueprint(dzongkha_bp, url_prefix='/api')
+app.register_blueprint(health_bp, url_prefix='/api')
+
+# Optionally preload services in the background (SERVICE_WARMUP=all or a list)
+start_warmup_from_env()
 
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
-with app.app_context():
-    db.create_all()
+if not in_worker_process():
+    with app.app_context():
+        db.create_all()
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
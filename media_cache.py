@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+CACHE_ROOT = os.getenv('MEDIA_CACHE_DIR', '/tmp/media_cache')
+# Eviction trims to this fraction of the budget, so the next few puts do not rescan
+EVICT_LOW_WATERMARK = 0.9
+
+
+class DiskLRUCache:
+    """Content-addressed file cache with size-bounded least-recently-used eviction"""
+
+    def __init__(self, name, max_bytes, cache_dir=None):
+        self.name = name
+        self.dir = cache_dir or os.path.join(CACHE_ROOT, name)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._size = None  # Estimated bytes on disk; None until the startup scan finishes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        os.makedirs(self.dir, exist_ok=True)
+
+        # Size the cache once per process, off the import path
+        threading.Thread(target=self._seed_size, name=f"{name}-cache-size", daemon=True).start()
+
+    @staticmethod
+    def make_key(**parts):
+        """Stable digest of the inputs that determine a cached file"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key, ext):
+        return os.path.join(self.dir, key[:2], f"{key}.{ext.lstrip('.')}")
+
+    def get(self, key, ext):
+        """Return the cached file path for `key`, or None on a miss"""
+        path = self.path_for(key, ext)
+        try:
+            # mtime doubles as the recency stamp for eviction
+            os.utime(path)
+            return path
+        except OSError:
+            return None
+
+    def fetch(self, key, output_path, ext=None):
+        """Copy a cached entry to `output_path`; returns True on a hit"""
+        ext = ext or _extension(output_path)
+        cached_path = self.get(key, ext)
+        if cached_path is not None and os.path.abspath(cached_path) != os.path.abspath(output_path):
+            try:
+                shutil.copyfile(cached_path, output_path)
+            except OSError:
+                # Evicted between lookup and copy
+                cached_path = None
+        self._record(cached_path is not None)
+        return cached_path is not None
+
+    def put(self, key, source_path, ext=None):
+        """Store a copy of `source_path` under `key` and return the cached path"""
+        ext = ext or _extension(source_path)
+        path = self.path_for(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            size = os.path.getsize(source_path)
+            if size == 0 or size > self.max_bytes:
+                return None
+
+            # Write beside the target and rename so readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"{self.name} cache store failed: {e}")
+            return None
+
+        with self.lock:
+            self.stores += 1
+            if self._size is not None:
+                self._size += size
+            over_budget = self._size is not None and self._size > self.max_bytes
+
+        if over_budget:
+            self.evict()
+        return path
+
+    def _record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes
+            }
+
+    def _scan(self):
+        """(mtime, size, path) of every cached file, and their total size"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def _seed_size(self):
+        _, total = self._scan()
+        with self.lock:
+            if self._size is None:
+                self._size = total
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache is back under its low watermark"""
+        with self.lock:
+            entries, total = self._scan()
+            target = self.max_bytes * EVICT_LOW_WATERMARK
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+
+            self._size = total
+
+
+def normalize_prompt(prompt):
+    """Case- and whitespace-insensitive form of an image prompt"""
+    prompt = re.sub(r'\s+', ' ', prompt).strip().lower()
+    return re.sub(r' (?=[,.;:!?])', '', prompt)
+
+
+def image_cache_key(prompt, style, size, model, quality):
+    """Stable image cache key for a provider prompt and its render settings"""
+    return image_cache.make_key(
+        prompt=normalize_prompt(prompt),
+        style=style,
+        size=size,
+        model=model,
+        quality=quality
+    )
+
+
+def _extension(path):
+    return os.path.splitext(path)[1].lstrip('.') or 'bin'
+
+
+# Synthesized speech, shared by every TTS engine
+tts_cache = DiskLRUCache('tts', int(os.getenv('TTS_CACHE_MAX_BYTES', str(2 * 1024 ** 3))))
+
+# Provider-generated images, keyed by normalized prompt and render settings
+image_cache = DiskLRUCache('images', int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(5 * 1024 ** 3))))
+
+# Rendered segments (image, audio and clip), so edited drafts only redo changed sentences
+render_cache = DiskLRUCache('segments', int(os.getenv('RENDER_CACHE_MAX_BYTES', str(5 * 1024 ** 3))))
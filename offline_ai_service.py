@@ -3,23 +3,108 @@ import subprocess
 import json
 import tempfile
 import sqlite3
+import shutil
 from datetime import datetime
 import base64
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageFilter
 import numpy as np
 import wave
 import struct
 import math
 import random
+import multiprocessing
+import threading
+import hashlib
+import re
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from src.services.workspace import JobWorkspace, cleanup_stale_workspaces
+from src.services.media_cache import render_cache, tts_cache
+from src.services.synthesis_server import get_synthesis_pool, write_pcm_wav
+from src.services.text_layout import load_font, wrap_text
+from src.services.audio_timeline import assemble_narration, encode_timeline
+from src.services.frame_sink import FrameSink
+from src.services.hls_writer import HLSPlaylistWriter, HLS_STREAM_MAX_AGE
+from src.services.encode_profiles import encode_fps, encode_resolution, video_encoder_args
+
+# Engine settings that change the synthesized audio; part of the TTS cache key
+TTS_ENGINE_SETTINGS = {
+    'espeak': {'model_version': 'espeak-s150-p50', 'sample_rate': 22050},
+    'festival': {'model_version': 'festival-kal_diphone', 'sample_rate': 16000},
+    'synthetic': {'model_version': 'synthetic-tones-v1', 'sample_rate': 22050}
+}
+
+# voice_id -> espeak voice
+ESPEAK_VOICES = {
+    'default': 'en',
+    'male': 'en+m3',
+    'female': 'en+f3',
+    'child': 'en+f4'
+}
+
+# Built-in style templates; more can be registered at runtime
+DEFAULT_IMAGE_TEMPLATES = [
+    {'name': 'business', 'color': '#2563eb', 'style': 'professional'},
+    {'name': 'nature', 'color': '#16a34a', 'style': 'organic'},
+    {'name': 'technology', 'color': '#7c3aed', 'style': 'modern'},
+    {'name': 'education', 'color': '#dc2626', 'style': 'academic'},
+    {'name': 'creative', 'color': '#ea580c', 'style': 'artistic'}
+]
+BUILTIN_TEMPLATE_NAMES = frozenset(template['name'] for template in DEFAULT_IMAGE_TEMPLATES)
+
+# Bump when create_template_image changes its output
+TEMPLATE_GENERATOR_VERSION = 2
+TEMPLATE_SIZE = (1280, 720)
+
+# Decoded template bitmaps shared by every image generated in this process
+_template_cache = {}
+_template_cache_lock = threading.Lock()
+
+# Long-lived render process pool, started on the first parallel render
+_render_pool = None
+_render_pool_lock = threading.Lock()
+# Per-process service rebuilt from plain settings inside each render worker
+_worker_service = None
+
+
+def load_template_image(template_path):
+    """Return the decoded template, reloading only if the file changed"""
+    try:
+        mtime = os.path.getmtime(template_path)
+    except OSError:
+        return None
+    
+    cached = _template_cache.get(template_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    
+    with Image.open(template_path) as img:
+        image = img.convert('RGB')
+    with _template_cache_lock:
+        _template_cache[template_path] = (mtime, image)
+    return image
+
 
 class OfflineAIService:
     def __init__(self):
         self.temp_dir = "/tmp/offline_ai"
         self.models_dir = "/tmp/ai_models"
         self.db_path = "/tmp/offline_ai.db"
+        self.jobs_dir = os.path.join(self.temp_dir, 'jobs')
+        self.videos_dir = os.path.join(self.temp_dir, 'videos')
+        self.hls_dir = os.path.join(self.temp_dir, 'hls')
+        self.previews_dir = os.path.join(self.temp_dir, 'previews')
         
         os.makedirs(self.temp_dir, exist_ok=True)
         os.makedirs(self.models_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        os.makedirs(self.videos_dir, exist_ok=True)
+        os.makedirs(self.hls_dir, exist_ok=True)
+        os.makedirs(self.previews_dir, exist_ok=True)
+        cleanup_stale_workspaces(self.jobs_dir)
+        cleanup_stale_workspaces(self.previews_dir)
+        cleanup_stale_workspaces(self.hls_dir, HLS_STREAM_MAX_AGE)
         
         self.init_database()
         self.init_local_models()
@@ -119,32 +204,116 @@ class OfflineAIService:
         pass
     
     def create_image_templates(self):
-        """Create basic image templates for offline use"""
+        """Create basic image templates for offline use, reusing ones already on disk"""
         templates_dir = os.path.join(self.models_dir, 'image_templates')
         os.makedirs(templates_dir, exist_ok=True)
         
-        # Create basic templates
-        templates = [
-            {'name': 'business', 'color': '#2563eb', 'style': 'professional'},
-            {'name': 'nature', 'color': '#16a34a', 'style': 'organic'},
-            {'name': 'technology', 'color': '#7c3aed', 'style': 'modern'},
-            {'name': 'education', 'color': '#dc2626', 'style': 'academic'},
-            {'name': 'creative', 'color': '#ea580c', 'style': 'artistic'}
-        ]
+        manifest = self.load_template_manifest(templates_dir)
+        changed = False
+        
+        # Built-in templates plus any registered at runtime in earlier sessions
+        templates = DEFAULT_IMAGE_TEMPLATES + self.list_registered_templates()
         
         for template in templates:
+            fingerprint = self.template_fingerprint(template)
+            template_path = os.path.join(templates_dir, f"{template['name']}.png")
+            if manifest.get(template['name']) == fingerprint and os.path.exists(template_path):
+                continue
+            
             self.create_template_image(template, templates_dir)
+            manifest[template['name']] = fingerprint
+            changed = True
+        
+        if changed:
+            self.save_template_manifest(templates_dir, manifest)
+    
+    def template_fingerprint(self, template):
+        """Digest of everything that determines a template's pixels"""
+        payload = json.dumps({
+            'color': template['color'],
+            'style': template['style'],
+            'size': TEMPLATE_SIZE,
+            'generator': TEMPLATE_GENERATOR_VERSION
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def load_template_manifest(self, templates_dir):
+        try:
+            with open(os.path.join(templates_dir, 'manifest.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_template_manifest(self, templates_dir, manifest):
+        # Write then rename so concurrent workers never read a partial manifest
+        manifest_path = os.path.join(templates_dir, 'manifest.json')
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    
+    def register_style_template(self, name, color, style='professional', category='custom'):
+        """Add or replace a style template without restarting the server"""
+        if not re.match(r'^[a-z0-9_-]{1,64}$', name):
+            raise ValueError("Template name must be 1-64 lowercase letters, digits, '-' or '_'")
+        if name in BUILTIN_TEMPLATE_NAMES:
+            raise ValueError(f"'{name}' is a built-in template and cannot be replaced")
+        ImageColor.getrgb(color)  # Raises ValueError for unknown colors
+        
+        template = {'name': name, 'color': color, 'style': style}
+        templates_dir = os.path.join(self.models_dir, 'image_templates')
+        os.makedirs(templates_dir, exist_ok=True)
+        template_path = self.create_template_image(template, templates_dir)
+        
+        manifest = self.load_template_manifest(templates_dir)
+        manifest[name] = self.template_fingerprint(template)
+        self.save_template_manifest(templates_dir, manifest)
+        
+        # Persist so the style is rebuilt (or reused) on the next boot
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO templates (id, name, category, settings, preview_path)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (name, name, category, json.dumps({'color': color, 'style': style}), template_path))
+        conn.commit()
+        conn.close()
+        
+        return {'name': name, 'color': color, 'style': style, 'category': category, 'path': template_path}
+    
+    def list_registered_templates(self):
+        """Templates registered at runtime, from the local database"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT name, settings FROM templates')
+        rows = cursor.fetchall()
+        conn.close()
+        
+        templates = []
+        for name, settings in rows:
+            # Rows saved before built-in names were reserved would fight the built-in
+            if name in BUILTIN_TEMPLATE_NAMES:
+                continue
+            try:
+                settings = json.loads(settings) if settings else {}
+                templates.append({'name': name, 'color': settings['color'], 'style': settings.get('style', 'professional')})
+            except (ValueError, KeyError):
+                continue
+        return templates
     
     def create_template_image(self, template, output_dir):
         """Create a template image"""
-        img = Image.new('RGB', (1280, 720), color=template['color'])
-        draw = ImageDraw.Draw(img)
+        width, height = TEMPLATE_SIZE
+        base = np.array(ImageColor.getrgb(template['color'])[:3], dtype=np.int32)
+        
+        # Gradient: darken each row by up to 30% towards the top, all rows at once
+        rows = np.arange(height)
+        alpha = (255 * (1 - rows / height) * 0.3).astype(np.int32)
+        row_colors = np.clip(base[None, :] - alpha[:, None], 0, 255).astype(np.uint8)
+        pixels = np.ascontiguousarray(np.broadcast_to(row_colors[:, None, :], (height, width, 3)))
         
-        # Add gradient effect
-        for y in range(720):
-            alpha = int(255 * (1 - y / 720) * 0.3)
-            color = tuple(max(0, c - alpha) for c in img.getpixel((0, y)))
-            draw.line([(0, y), (1280, y)], fill=color)
+        img = Image.fromarray(pixels, 'RGB')
+        draw = ImageDraw.Draw(img)
         
         # Add geometric patterns based on style
         if template['style'] == 'professional':
@@ -190,8 +359,13 @@ class OfflineAIService:
     
     def generate_speech_offline(self, text, voice_id='default', output_path=None):
         """Generate speech using offline TTS"""
+        cache_key = self.speech_cache_key(text, voice_id, self.tts_engine)
         if output_path is None:
-            output_path = os.path.join(self.temp_dir, f'speech_{hash(text)}.wav')
+            output_path = os.path.join(self.temp_dir, f'speech_{cache_key[:16]}.wav')
+        
+        # Repeated sentences, intros and retried jobs reuse earlier output
+        if tts_cache.fetch(cache_key, output_path):
+            return output_path
         
         try:
             if self.tts_engine == 'espeak':
@@ -201,23 +375,131 @@ class OfflineAIService:
             else:
                 self.generate_synthetic_speech(text, output_path)
             
+            tts_cache.put(cache_key, output_path)
             return output_path
             
         except Exception as e:
             print(f"Offline TTS failed: {e}")
             return self.generate_synthetic_speech(text, output_path)
     
+    def generate_speech_batch(self, texts, voice_id='default', output_paths=None):
+        """
+        Generate speech for several sentences at once. With a resident engine,
+        every uncached sentence goes to the worker pool in one batch so the
+        workers synthesize in parallel; otherwise sentences are generated one
+        by one. Returns the output paths in input order.
+        """
+        if output_paths is None:
+            output_paths = [None] * len(texts)
+        
+        pool = get_synthesis_pool(self.tts_engine) if self.tts_engine in ('espeak', 'festival') else None
+        if pool is None:
+            return [self.generate_speech_offline(text, voice_id, path) for text, path in zip(texts, output_paths)]
+        
+        keys = [self.speech_cache_key(text, voice_id, self.tts_engine) for text in texts]
+        paths = [
+            path or os.path.join(self.temp_dir, f'speech_{key[:16]}.wav')
+            for key, path in zip(keys, output_paths)
+        ]
+        misses = [i for i in range(len(texts)) if not tts_cache.fetch(keys[i], paths[i])]
+        if not misses:
+            return paths
+        
+        voice = ESPEAK_VOICES.get(voice_id, 'en') if self.tts_engine == 'espeak' else None
+        try:
+            results = pool.synthesize_batch([texts[i] for i in misses], voice)
+        except Exception as e:
+            print(f"Resident {self.tts_engine} batch failed, synthesizing per sentence: {e}")
+            for i in misses:
+                paths[i] = self.generate_speech_offline(texts[i], voice_id, paths[i])
+            return paths
+        
+        for i, (pcm, sample_rate) in zip(misses, results):
+            write_pcm_wav(pcm, sample_rate, paths[i])
+            tts_cache.put(keys[i], paths[i])
+        return paths
+    
+    def speech_cache_key(self, text, voice_id, engine):
+        """Stable TTS cache key for this text, voice and engine"""
+        settings = TTS_ENGINE_SETTINGS.get(engine, TTS_ENGINE_SETTINGS['synthetic'])
+        return tts_cache.make_key(
+            text=text,
+            voice_id=voice_id,
+            engine=engine,
+            model_version=settings['model_version'],
+            sample_rate=settings['sample_rate']
+        )
+    
+    def preview_manifest_path(self, job_id):
+        """Narration manifest kept for a preview render"""
+        return os.path.join(self.previews_dir, os.path.basename(job_id), 'manifest.json')
+    
+    def has_preview(self, job_id):
+        return bool(job_id) and os.path.exists(self.preview_manifest_path(job_id))
+    
+    def save_preview_narration(self, job_id, voice_id, segments, audio_paths):
+        """
+        Keep a preview's narration outside its workspace so the final render
+        can reuse it (see restore_preview_narration) even after the TTS cache
+        has evicted the sentences.
+        """
+        preview_dir = os.path.dirname(self.preview_manifest_path(job_id))
+        os.makedirs(preview_dir, exist_ok=True)
+        
+        entries = []
+        for i, (text, audio_path) in enumerate(zip(segments, audio_paths)):
+            if not audio_path or not os.path.exists(audio_path):
+                continue
+            kept_path = os.path.join(preview_dir, f'audio_{i}.wav')
+            shutil.copyfile(audio_path, kept_path)
+            entries.append({'text': text, 'audio': kept_path})
+        
+        manifest = {'voice_id': voice_id, 'engine': self.tts_engine, 'segments': entries}
+        tmp_path = self.preview_manifest_path(job_id) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.preview_manifest_path(job_id))
+    
+    def restore_preview_narration(self, preview_job_id, segments, voice_id):
+        """
+        Put a preview's narration back into the TTS cache for the sentences
+        this render shares with it, so they are not synthesized again.
+        Returns the number of sentences restored.
+        """
+        if not preview_job_id:
+            return 0
+        try:
+            with open(self.preview_manifest_path(preview_job_id)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Preview {preview_job_id} narration unavailable: {e}")
+            return 0
+        
+        # Audio from another voice or engine does not match this render
+        if manifest.get('voice_id') != voice_id or manifest.get('engine') != self.tts_engine:
+            return 0
+        
+        wanted = set(segments)
+        restored = 0
+        for entry in manifest.get('segments', []):
+            if entry.get('text') in wanted and os.path.exists(entry.get('audio', '')):
+                tts_cache.put(self.speech_cache_key(entry['text'], voice_id, self.tts_engine), entry['audio'])
+                restored += 1
+        return restored
+    
     def generate_espeak_speech(self, text, output_path, voice_id):
         """Generate speech using espeak"""
-        # Map voice_id to espeak voices
-        voice_map = {
-            'default': 'en',
-            'male': 'en+m3',
-            'female': 'en+f3',
-            'child': 'en+f4'
-        }
+        voice = ESPEAK_VOICES.get(voice_id, 'en')
         
-        voice = voice_map.get(voice_id, 'en')
+        # Prefer the resident espeak workers over a process per sentence
+        pool = get_synthesis_pool('espeak')
+        if pool is not None:
+            try:
+                pcm, sample_rate = pool.synthesize(text, voice)
+                write_pcm_wav(pcm, sample_rate, output_path)
+                return
+            except Exception as e:
+                print(f"Resident espeak failed, spawning espeak: {e}")
         
         cmd = [
             'espeak', '-v', voice, '-s', '150', '-p', '50',
@@ -228,6 +510,16 @@ class OfflineAIService:
     
     def generate_festival_speech(self, text, output_path):
         """Generate speech using festival"""
+        # Prefer the resident festival process over a process per sentence
+        pool = get_synthesis_pool('festival')
+        if pool is not None:
+            try:
+                pcm, sample_rate = pool.synthesize(text)
+                write_pcm_wav(pcm, sample_rate, output_path)
+                return
+            except Exception as e:
+                print(f"Resident festival failed, spawning festival: {e}")
+        
         # Create festival script
         script_path = output_path.replace('.wav', '.scm')
         with open(script_path, 'w') as f:
@@ -241,28 +533,34 @@ class OfflineAIService:
         """Generate synthetic speech using simple tone generation"""
         # Create a simple beep pattern based on text
         sample_rate = 22050
-        duration = len(text) * 0.1  # 0.1 seconds per character
         
-        # Generate tone sequence
-        frames = []
-        for i, char in enumerate(text):
+        # 0.1 s tone per letter, 0.05 s silence for everything else
+        sample_index = np.arange(int(sample_rate * 0.1))
+        silence = np.zeros(int(sample_rate * 0.05), dtype='<i2')
+        
+        # Each distinct letter's tone is computed once and reused
+        tones = {}
+        chunks = []
+        for char in text:
             if char.isalpha():
                 # Generate tone based on character
                 freq = 200 + (ord(char.lower()) - ord('a')) * 20
-                for j in range(int(sample_rate * 0.1)):
-                    value = int(32767 * 0.3 * math.sin(2 * math.pi * freq * j / sample_rate))
-                    frames.append(struct.pack('<h', value))
+                tone = tones.get(freq)
+                if tone is None:
+                    wave_values = 32767 * 0.3 * np.sin(2 * np.pi * freq * sample_index / sample_rate)
+                    tone = tones[freq] = wave_values.astype('<i2')  # truncates like int()
+                chunks.append(tone)
             else:
-                # Silence for non-alphabetic characters
-                for j in range(int(sample_rate * 0.05)):
-                    frames.append(struct.pack('<h', 0))
+                chunks.append(silence)
+        
+        samples = np.concatenate(chunks) if chunks else silence[:0]
         
         # Write WAV file
         with wave.open(output_path, 'wb') as wav_file:
             wav_file.setnchannels(1)
             wav_file.setsampwidth(2)
             wav_file.setframerate(sample_rate)
-            wav_file.writeframes(b''.join(frames))
+            wav_file.writeframes(samples.tobytes())
         
         return output_path
     
@@ -271,11 +569,17 @@ class OfflineAIService:
         if output_path is None:
             output_path = os.path.join(self.temp_dir, f'image_{hash(description)}.png')
         
-        # Load base template
+        self.render_image_offline(description, style).save(output_path)
+        return output_path
+    
+    def render_image_offline(self, description, style='business'):
+        """Render the slide for `description` as an in-memory RGB image"""
+        # Load base template (decoded once per process, copied per image)
         template_path = os.path.join(self.models_dir, 'image_templates', f'{style}.png')
+        template = load_template_image(template_path)
         
-        if os.path.exists(template_path):
-            img = Image.open(template_path).copy()
+        if template is not None:
+            img = template.copy()
         else:
             # Create basic colored background
             colors = {
@@ -294,43 +598,22 @@ class OfflineAIService:
         # Add visual elements based on description keywords
         self.add_contextual_elements(img, description)
         
-        img.save(output_path)
-        return output_path
+        return img
     
     def add_text_to_image(self, img, text):
         """Add text overlay to image"""
         draw = ImageDraw.Draw(img)
         
-        # Try to load a font
-        try:
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 48)
-        except:
-            font = ImageFont.load_default()
+        # Font and word widths are cached process-wide
+        font = load_font()
         
         # Wrap text
-        words = text.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            bbox = draw.textbbox((0, 0), test_line, font=font)
-            if bbox[2] - bbox[0] < 1000:  # Max width
-                current_line.append(word)
-            else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(' '.join(current_line))
+        lines = wrap_text(text, font, 1000)  # Max width
         
         # Draw text lines
         y_offset = (720 - len(lines) * 60) // 2
-        for i, line in enumerate(lines):
-            bbox = draw.textbbox((0, 0), line, font=font)
-            text_width = bbox[2] - bbox[0]
-            x = (1280 - text_width) // 2
+        for i, (line, text_width) in enumerate(lines):
+            x = int((1280 - text_width) // 2)
             y = y_offset + i * 60
             
             # Add text shadow
@@ -411,35 +694,286 @@ class OfflineAIService:
                 points = [(x, y), (x+size, y+size//2), (x, y+size)]
                 draw.polygon(points, fill=color)
     
-    def generate_video_offline(self, script, voice_id='default', style='business'):
-        """Generate complete video offline"""
+    def generate_video_offline(self, script, voice_id='default', style='business', options=None):
+        """
+        Generate complete video offline
+        options['render_mode']: 'timeline' (default) joins the narration in memory
+        and encodes it once with the image timeline; 'segments' encodes one clip
+        per sentence and concatenates them; 'single_pass' concatenates the
+        segments inside one ffmpeg filter graph; 'stream' renders slides in
+        memory and pipes raw frames straight into ffmpeg, so no image is
+        written to disk
+        options['normalize_audio']: level each segment's narration (timeline and stream modes)
+        options['encode_profile']: 'default' or 'still' (low-rate x264 tuned for slides)
+        options['use_cache']: reuse unchanged segments from earlier renders (default True)
+        options['preview']: quick low-resolution render with the 'preview' encode profile;
+        its narration is kept under previews_dir/<job_id> for the final render
+        options['preview_job_id']: job_id of an earlier preview whose narration is reused
+        options['parallel']: render segments across a process pool
+        options['max_workers']: pool size, capped at OFFLINE_RENDER_WORKERS or the CPU count
+        options['job_id']: names the job's scratch workspace and final video
+        """
+        if options is None:
+            options = {}
+        
+        render_mode = options.get('render_mode', 'timeline')
+        encode_segments = render_mode == 'segments'
+        encode_profile = 'preview' if options.get('preview') else options.get('encode_profile', 'default')
+        use_cache = options.get('use_cache', True)
+        
         try:
             # Split script into segments
             segments = self.split_script(script)
+            self.restore_preview_narration(options.get('preview_job_id'), segments, voice_id)
             
-            # Generate content for each segment
-            video_segments = []
-            
-            for i, segment in enumerate(segments):
-                # Generate audio
-                audio_path = self.generate_speech_offline(segment, voice_id)
+            # Intermediates live in a per-job workspace so jobs never share paths
+            with JobWorkspace(self.jobs_dir, options.get('job_id')) as workspace:
+                final_path = os.path.join(self.videos_dir, f'{workspace.job_id}.mp4')
                 
-                # Generate image
-                image_path = self.generate_image_offline(segment, style=style)
+                if render_mode == 'stream':
+                    return self.render_video_streamed(segments, voice_id, style, final_path, workspace, options, encode_profile)
                 
-                # Create video segment
-                segment_path = self.create_video_segment(image_path, audio_path, i)
-                video_segments.append(segment_path)
-            
-            # Combine segments
-            final_video = self.combine_video_segments(video_segments)
-            
-            return final_video
+                # Generate audio, image and (optionally) the encoded clip per segment
+                if options.get('parallel') and len(segments) > 1:
+                    rendered = self.render_segments_parallel(
+                        segments, voice_id, style, encode_segments,
+                        options.get('max_workers'), workspace.dir, encode_profile, use_cache
+                    )
+                else:
+                    # Narration for segments the render cache cannot supply goes first, as one
+                    # batch across the resident TTS workers; render_segment then picks each
+                    # sentence up from the TTS cache
+                    pending = [
+                        i for i, segment in enumerate(segments)
+                        if not (use_cache and self.segment_is_cached(segment, voice_id, style, encode_segments, encode_profile))
+                    ]
+                    self.generate_speech_batch(
+                        [segments[i] for i in pending], voice_id, [workspace.path(f'audio_{i}.wav') for i in pending]
+                    )
+                    rendered = [
+                        self.render_segment(i, segment, voice_id, style, encode_segments, workspace.dir, encode_profile, use_cache)
+                        for i, segment in enumerate(segments)
+                    ]
+                
+                if options.get('preview'):
+                    self.save_preview_narration(
+                        workspace.job_id, voice_id, segments, [audio_path for _, audio_path, _ in rendered]
+                    )
+                
+                if render_mode == 'timeline':
+                    narration = assemble_narration(
+                        [audio_path for _, audio_path, _ in rendered],
+                        workspace.path('narration.wav'),
+                        normalize=options.get('normalize_audio')
+                    )
+                    return encode_timeline(
+                        [image_path for image_path, _, _ in rendered], narration, final_path,
+                        encode_profile=encode_profile
+                    )
+                
+                if render_mode == 'single_pass':
+                    segment_media = [(image_path, audio_path) for image_path, audio_path, _ in rendered]
+                    return self.render_video_single_pass(segment_media, final_path, encode_profile)
+                
+                # Combine per-sentence clips
+                video_segments = [segment_path for _, _, segment_path in rendered]
+                final_video = self.combine_video_segments(video_segments, final_path, workspace.dir)
+                
+                return final_video
             
         except Exception as e:
             print(f"Offline video generation failed: {e}")
             return None
     
+    def render_video_streamed(self, segments, voice_id, style, final_path, workspace, options, encode_profile='default'):
+        """Synthesize the narration, then pipe each slide into one ffmpeg process"""
+        audio_paths = self.generate_speech_batch(
+            segments, voice_id, [workspace.path(f'audio_{i}.wav') for i in range(len(segments))]
+        )
+        if options.get('preview'):
+            self.save_preview_narration(workspace.job_id, voice_id, segments, audio_paths)
+        narration = assemble_narration(audio_paths, workspace.path('narration.wav'), normalize=options.get('normalize_audio'))
+        
+        width, height = encode_resolution(encode_profile).split('x')
+        sink = FrameSink(
+            final_path,
+            size=(int(width), int(height)),
+            fps=encode_fps(encode_profile, 25),
+            audio_path=narration.path,
+            encoder_args=video_encoder_args(encode_profile, 25)
+        )
+        with sink:
+            for segment, (start, end) in zip(segments, narration.segments):
+                sink.write_still(self.render_image_offline(segment, style), end - start)
+            return sink.close()
+    
+    def generate_video_hls(self, script, voice_id='default', style='business', options=None, progress_callback=None):
+        """
+        Render the script as a live HLS stream under hls_dir/<job_id>.
+        Segments are rendered in script order and each is published to the
+        playlist as soon as it is encoded, so playback can start after the
+        first one. When every segment is done the playlist is closed and
+        remuxed (no re-encode) into videos_dir/<job_id>.mp4, which is returned.
+        Streams are removed HLS_STREAM_MAX_AGE seconds after they last changed.
+        Takes the same options as generate_video_offline except render_mode and parallel.
+        """
+        if options is None:
+            options = {}
+        
+        encode_profile = 'preview' if options.get('preview') else options.get('encode_profile', 'default')
+        use_cache = options.get('use_cache', True)
+        fps = encode_fps(encode_profile, 25)
+        segments = self.split_script(script)
+        self.restore_preview_narration(options.get('preview_job_id'), segments, voice_id)
+        
+        # Each new stream sweeps out the ones whose playback window has passed
+        cleanup_stale_workspaces(self.hls_dir, HLS_STREAM_MAX_AGE)
+        
+        with JobWorkspace(self.jobs_dir, options.get('job_id')) as workspace:
+            playlist = HLSPlaylistWriter(self.hls_path(workspace.job_id))
+            if progress_callback:
+                progress_callback('segments', completed=0, total=len(segments))
+            
+            audio_paths = []
+            try:
+                for i, segment in enumerate(segments):
+                    image_path, audio_path, _ = self.render_segment(
+                        i, segment, voice_id, style, False, workspace.dir, encode_profile, use_cache
+                    )
+                    audio_paths.append(audio_path)
+                    duration = self.get_audio_duration(audio_path)
+                    if duration:
+                        playlist.encode_segment(
+                            image_path, audio_path, duration,
+                            video_encoder_args(encode_profile, 25),
+                            fps=fps, resolution=encode_resolution(encode_profile)
+                        )
+                    if progress_callback:
+                        progress_callback('segments', completed=i + 1, total=len(segments))
+            finally:
+                # Close the playlist even on failure so players stop polling
+                playlist_path = playlist.finish()
+            
+            if options.get('preview'):
+                self.save_preview_narration(workspace.job_id, voice_id, segments, audio_paths)
+        
+        # The finished stream doubles as the downloadable video
+        final_path = os.path.join(self.videos_dir, f'{workspace.job_id}.mp4')
+        cmd = [
+            'ffmpeg', '-y',
+            '-i', playlist_path,
+            '-c', 'copy', '-bsf:a', 'aac_adtstoasc',
+            final_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"HLS remux failed: {result.stderr[-2000:]}")
+            return None
+        return final_path
+    
+    def hls_path(self, job_id, name=None):
+        """Directory of a job's HLS stream, or a file inside it"""
+        directory = os.path.join(self.hls_dir, job_id)
+        return os.path.join(directory, name) if name else directory
+    
+    def render_segment(self, index, segment, voice_id, style, encode=True, work_dir=None, encode_profile='default', use_cache=True):
+        """Generate audio, image and optionally the video clip for one segment"""
+        audio_path = os.path.join(work_dir, f'audio_{index}.wav') if work_dir else None
+        image_path = os.path.join(work_dir, f'image_{index}.png') if work_dir else None
+        cache_key = self.segment_cache_key(segment, voice_id, style, encode_profile) if work_dir else None
+        
+        # Sentences unchanged since an earlier render are spliced from the render cache
+        if cache_key and use_cache:
+            segment_path = os.path.join(work_dir, f'segment_{index}.mp4') if encode else None
+            if (render_cache.fetch(cache_key, image_path) and render_cache.fetch(cache_key, audio_path)
+                    and (not encode or render_cache.fetch(cache_key, segment_path))):
+                return image_path, audio_path, segment_path
+        
+        # Generate audio
+        audio_path = self.generate_speech_offline(segment, voice_id, audio_path)
+        
+        # Generate image
+        image_path = self.generate_image_offline(segment, image_path, style=style)
+        
+        # Create video segment
+        segment_path = self.create_video_segment(image_path, audio_path, index, work_dir, encode_profile) if encode else None
+        
+        if cache_key:
+            for path in (image_path, audio_path, segment_path):
+                if path and os.path.exists(path):
+                    render_cache.put(cache_key, path)
+        
+        return image_path, audio_path, segment_path
+    
+    def segment_is_cached(self, segment, voice_id, style, encode=True, encode_profile='default'):
+        """True if render_segment would be served entirely from the render cache"""
+        cache_key = self.segment_cache_key(segment, voice_id, style, encode_profile)
+        extensions = ['png', 'wav'] + (['mp4'] if encode else [])
+        return all(render_cache.get(cache_key, ext) for ext in extensions)
+    
+    def segment_cache_key(self, segment, voice_id, style, encode_profile='default'):
+        """Digest of everything that determines a rendered segment's image, audio and clip"""
+        template_path = os.path.join(self.models_dir, 'image_templates', f'{style}.png')
+        try:
+            stat = os.stat(template_path)
+            template_stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            template_stamp = None
+        
+        return render_cache.make_key(
+            text=segment,
+            style=style,
+            template=template_stamp,
+            generator=TEMPLATE_GENERATOR_VERSION,
+            speech=self.speech_cache_key(segment, voice_id, self.tts_engine),
+            encode_profile=encode_profile
+        )
+    
+    def render_segments_parallel(self, segments, voice_id, style, encode=True, max_workers=None, work_dir=None, encode_profile='default', use_cache=True):
+        """Render segments across a process pool, keeping script order"""
+        # Requests may ask for fewer workers than the machine allows, never more
+        limit = int(os.getenv('OFFLINE_RENDER_WORKERS', '0')) or os.cpu_count() or 1
+        max_workers = max(1, min(max_workers or limit, limit, len(segments)))
+        
+        executor = get_render_pool(self.worker_settings(), limit)
+        results = [None] * len(segments)
+        in_flight = {}
+        try:
+            # The pool is shared, so at most max_workers of this render's segments run at once
+            for i, segment in enumerate(segments):
+                if len(in_flight) >= max_workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[in_flight.pop(future)] = future.result()
+                future = executor.submit(_render_segment_in_worker, i, segment, voice_id, style, encode, work_dir, encode_profile, use_cache)
+                in_flight[future] = i
+            for future in in_flight:
+                results[in_flight[future]] = future.result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next render
+            reset_render_pool(executor)
+            raise
+        return results
+    
+    def worker_settings(self):
+        """Plain configuration a render worker needs to rebuild this service"""
+        return {
+            'temp_dir': self.temp_dir,
+            'models_dir': self.models_dir,
+            'db_path': self.db_path,
+            'jobs_dir': self.jobs_dir,
+            'videos_dir': self.videos_dir,
+            'hls_dir': self.hls_dir,
+            'tts_engine': self.tts_engine
+        }
+    
+    @classmethod
+    def from_settings(cls, settings):
+        """Service built from worker_settings() without the startup work (database, templates, TTS probing)"""
+        service = cls.__new__(cls)
+        service.__dict__.update(settings)
+        return service
+    
     def split_script(self, script):
         """Split script into logical segments"""
         # Simple sentence splitting
@@ -447,41 +981,97 @@ class OfflineAIService:
         sentences = re.split(r'[.!?]+', script)
         return [s.strip() for s in sentences if s.strip()]
     
-    def create_video_segment(self, image_path, audio_path, index):
+    def create_video_segment(self, image_path, audio_path, index, work_dir=None, encode_profile='default'):
         """Create video segment from image and audio"""
-        output_path = os.path.join(self.temp_dir, f'segment_{index}.mp4')
+        output_path = os.path.join(work_dir or self.temp_dir, f'segment_{index}.mp4')
         
         cmd = [
             'ffmpeg', '-y',
-            '-loop', '1', '-i', image_path,
-            '-i', audio_path,
-            '-c:v', 'libx264', '-c:a', 'aac',
+            '-loop', '1', '-framerate', str(encode_fps(encode_profile, 25)), '-i', image_path,
+            '-i', audio_path
+        ] + video_encoder_args(encode_profile, 25) + [
+            '-c:a', 'aac',
             '-shortest', '-pix_fmt', 'yuv420p',
-            '-vf', 'scale=1280:720',
+            '-vf', f"scale={encode_resolution(encode_profile).replace('x', ':')}",
             output_path
         ]
         
         subprocess.run(cmd, capture_output=True)
         return output_path
     
-    def combine_video_segments(self, segments):
+    def render_video_single_pass(self, segment_media, output_path=None, encode_profile='default'):
+        """Encode all (image, audio) pairs into the final video with one ffmpeg run"""
+        if not segment_media:
+            return None
+        
+        if output_path is None:
+            output_path = os.path.join(self.temp_dir, 'final_video.mp4')
+        
+        rate = encode_fps(encode_profile, 25)
+        scale = encode_resolution(encode_profile).replace('x', ':')
+        cmd = ['ffmpeg', '-y']
+        filters = []
+        concat_inputs = []
+        
+        for i, (image_path, audio_path) in enumerate(segment_media):
+            duration = self.get_audio_duration(audio_path)
+            
+            # Each still is looped for exactly as long as its narration
+            cmd += ['-loop', '1', '-t', f'{duration:.3f}', '-i', image_path]
+            cmd += ['-i', audio_path]
+            
+            video_input = 2 * i
+            audio_input = 2 * i + 1
+            filters.append(f'[{video_input}:v]scale={scale},setsar=1,fps={rate},format=yuv420p[v{i}]')
+            filters.append(f'[{audio_input}:a]aformat=sample_rates=44100:channel_layouts=stereo[a{i}]')
+            concat_inputs.append(f'[v{i}][a{i}]')
+        
+        filters.append(f"{''.join(concat_inputs)}concat=n={len(segment_media)}:v=1:a=1[v][a]")
+        
+        cmd += [
+            '-filter_complex', ';'.join(filters),
+            '-map', '[v]', '-map', '[a]'
+        ] + video_encoder_args(encode_profile, 25) + [
+            '-c:a', 'aac',
+            '-pix_fmt', 'yuv420p',
+            output_path
+        ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Single pass render failed: {result.stderr[-2000:]}")
+            return None
+        
+        return output_path
+    
+    def get_audio_duration(self, audio_path):
+        """Get audio duration in seconds"""
+        try:
+            with wave.open(audio_path, 'rb') as wav_file:
+                return wav_file.getnframes() / float(wav_file.getframerate())
+        except Exception:
+            # Not a plain PCM WAV; ask ffprobe instead
+            return self.get_video_duration(audio_path)
+    
+    def combine_video_segments(self, segments, final_path=None, work_dir=None):
         """Combine video segments into final video"""
         if not segments:
             return None
         
-        if len(segments) == 1:
+        if final_path is None:
             final_path = os.path.join(self.temp_dir, 'final_video.mp4')
+        
+        if len(segments) == 1:
             subprocess.run(['cp', segments[0], final_path])
             return final_path
         
         # Create concat file
-        concat_file = os.path.join(self.temp_dir, 'concat.txt')
+        concat_file = os.path.join(work_dir or self.temp_dir, 'concat.txt')
         with open(concat_file, 'w') as f:
             for segment in segments:
                 if os.path.exists(segment):
                     f.write(f"file '{segment}'\n")
         
-        final_path = os.path.join(self.temp_dir, 'final_video.mp4')
         cmd = [
             'ffmpeg', '-y',
             '-f', 'concat', '-safe', '0', '-i', concat_file,
@@ -497,7 +1087,8 @@ class OfflineAIService:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        draft_id = f"draft_{int(datetime.now().timestamp())}"
+        # Random ids: queued renders on different workers can finish in the same second
+        draft_id = f"draft_{uuid.uuid4().hex}"
         
         cursor.execute('''
             INSERT INTO drafts (id, title, script, voice_id, settings, created_at, updated_at)
@@ -551,7 +1142,7 @@ class OfflineAIService:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        video_id = f"video_{int(datetime.now().timestamp())}"
+        video_id = f"video_{uuid.uuid4().hex}"
         
         # Generate thumbnail
         thumbnail_path = self.generate_video_thumbnail(video_path)
@@ -600,3 +1191,40 @@ class OfflineAIService:
         except:
             return 0.0
 
+
+def get_render_pool(settings, max_workers):
+    """
+    Shared process pool for parallel renders. Workers are spawned once, so
+    their startup cost is paid on the first parallel render only; spawn avoids
+    inheriting locks held by the server's threads.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_render_worker,
+                initargs=(settings,)
+            )
+        return _render_pool
+
+
+def reset_render_pool(executor):
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is executor:
+            _render_pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _init_render_worker(settings):
+    """Render worker setup: sentences are synthesized without a resident TTS pool of its own"""
+    global _worker_service
+    os.environ['RESIDENT_TTS'] = '0'
+    _worker_service = OfflineAIService.from_settings(settings)
+
+
+def _render_segment_in_worker(index, segment, voice_id, style, encode, work_dir, encode_profile='default', use_cache=True):
+    """Process pool entry point"""
+    return _worker_service.render_segment(index, segment, voice_id, style, encode, work_dir, encode_profile, use_cache)
@@ -5,37 +5,100 @@ import uuid
 import json
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from src.services.offline_ai_service import OfflineAIService
+from src.services.service_registry import services
+from src.services.job_queue import QueueFullError
+from src.services.synthesis_server import get_synthesis_pool
+from src.services.hls_writer import PLAYLIST_NAME
 
 offline_video_bp = Blueprint('offline_video', __name__)
 
-# Initialize offline AI service
-offline_ai = OfflineAIService()
+# Offline AI service is built on first use by the shared registry
+offline_ai = services.proxy('offline_ai')
+
+# Queued renders share the video blueprint's workers
+job_queue = services.proxy('job_queue')
+
+def parse_max_workers(value):
+    """Client-requested worker count as a positive int, or None when not given"""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit() or int(value) < 1:
+        raise ValueError('max_workers must be a positive integer')
+    return int(value)
 
 @offline_video_bp.route('/generate-video-offline', methods=['POST'])
 @cross_origin()
 def generate_video_offline():
-    """Generate video using offline AI services"""
+    """
+    Generate video using offline AI services.
+    A final render given `preview_job_id` (the job_id a preview returned)
+    reuses that preview's narration for every unchanged sentence.
+    """
     try:
         data = request.json
         script = data.get('script', '')
         voice_id = data.get('voice_id', 'default')
         style = data.get('style', 'business')
         title = data.get('title', 'Untitled Video')
+        options = {
+            'render_mode': data.get('render_mode', 'timeline'),
+            'parallel': data.get('parallel', False),
+            'max_workers': data.get('max_workers'),
+            'normalize_audio': data.get('normalize_audio'),
+            'encode_profile': data.get('encode_profile', 'default'),
+            'preview': data.get('preview', False),
+            'preview_job_id': data.get('preview_job_id')
+        }
         
         if not script:
             return jsonify({'error': 'Script is required'}), 400
         
+        preview_job_id = options['preview_job_id']
+        if preview_job_id is not None and not (isinstance(preview_job_id, str) and offline_ai.has_preview(preview_job_id)):
+            return jsonify({'error': 'Preview not found', 'preview_job_id': preview_job_id}), 404
+        
+        try:
+            options['max_workers'] = parse_max_workers(options['max_workers'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # A preview's job_id is what a later final render passes as preview_job_id
+        job_id = str(uuid.uuid4())
+        options['job_id'] = job_id
+        
+        # Progressive output: return at once and let the client play the live playlist
+        if data.get('output') == 'hls':
+            job_queue.submit(
+                process_hls_generation, script, voice_id, style, title, options,
+                job_id=job_id,
+                stages=['segments'],
+                metadata={'origin': 'offline', 'output': 'hls', 'preview': bool(options['preview']), 'preview_job_id': preview_job_id}
+            )
+            
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'preview': bool(options['preview']),
+                'preview_job_id': preview_job_id,
+                'playlist_url': f'/api/offline/hls/{job_id}/{PLAYLIST_NAME}',
+                'status_url': f'/api/offline/job-status/{job_id}',
+                'message': 'Video generation queued; playback can start after the first segment',
+                'offline': True
+            }), 202
+        
         # Generate video offline
-        video_path = offline_ai.generate_video_offline(script, voice_id, style)
+        video_path = offline_ai.generate_video_offline(script, voice_id, style, options)
         
         if video_path and os.path.exists(video_path):
             # Save to database
             video_id = offline_ai.save_generated_video(title, script, video_path)
             
             return jsonify({
-                'job_id': video_id,
+                'job_id': job_id,
+                'video_id': video_id,
                 'status': 'completed',
+                'preview': bool(options['preview']),
+                'preview_job_id': preview_job_id,
                 'video_url': f'/api/offline/download-video/{video_id}',
                 'message': 'Video generated successfully offline',
                 'offline': True
@@ -43,10 +106,92 @@ def generate_video_offline():
         else:
             return jsonify({'error': 'Failed to generate video offline'}), 500
         
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         print(f"Offline video generation error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def process_offline_generation(script, voice_id, style, title, options, progress_callback=None):
+    """Render a video offline and store it; returns its video id"""
+    progress_callback('render', 0, 1)
+    video_path = offline_ai.generate_video_offline(script, voice_id, style, options)
+    if not video_path or not os.path.exists(video_path):
+        raise Exception('Failed to generate video offline')
+    progress_callback('render', 1, 1)
+    return offline_ai.save_generated_video(title, script, video_path)
+
+def process_hls_generation(script, voice_id, style, title, options, progress_callback=None):
+    """Render a live HLS stream, then store the finished video; returns its video id"""
+    video_path = offline_ai.generate_video_hls(script, voice_id, style, options, progress_callback)
+    if not video_path or not os.path.exists(video_path):
+        raise Exception('Failed to generate video offline')
+    return offline_ai.save_generated_video(title, script, video_path)
+
+@offline_video_bp.route('/hls/<job_id>/<segment_name>', methods=['GET'])
+@cross_origin()
+def get_hls_file(job_id, segment_name):
+    """Serve a job's live playlist or one of its MPEG-TS segments"""
+    try:
+        job_dir = offline_ai.hls_path(secure_filename(job_id))
+        file_path = os.path.join(job_dir, secure_filename(segment_name))
+        
+        if segment_name == PLAYLIST_NAME:
+            if not os.path.exists(file_path):
+                return jsonify({'error': 'Stream not found'}), 404
+            # The playlist grows while the job runs, so it must never be cached
+            response = send_file(file_path, mimetype='application/vnd.apple.mpegurl', max_age=0)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        if not segment_name.endswith('.ts') or not os.path.exists(file_path):
+            return jsonify({'error': 'Segment not found'}), 404
+        return send_file(file_path, mimetype='video/mp2t')
+        
+    except Exception as e:
+        print(f"HLS serve error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@offline_video_bp.route('/job-status/<job_id>', methods=['GET'])
+@cross_origin()
+def get_job_status(job_id):
+    """Get status of a queued offline render (progressive or draft)"""
+    try:
+        job = job_queue.get_job(job_id)
+        # Jobs from the video blueprint share the queue but are reported there
+        if not job or job['metadata'].get('origin') != 'offline':
+            return jsonify({'error': 'Job not found', 'job_id': job_id}), 404
+        
+        metadata = job['metadata']
+        response = {
+            'job_id': job_id,
+            'status': job['status'],
+            'stage': job['stage'],
+            'progress': job['stages'],
+            'queue_position': job['queue_position'],
+            'preview': metadata.get('preview', False),
+            'preview_job_id': metadata.get('preview_job_id'),
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at']
+        }
+        if metadata.get('output') == 'hls':
+            response['playlist_url'] = f'/api/offline/hls/{job_id}/{PLAYLIST_NAME}'
+        if metadata.get('draft_id'):
+            response['draft_id'] = metadata['draft_id']
+        if job['started_at'] and job['finished_at']:
+            elapsed = datetime.fromisoformat(job['finished_at']) - datetime.fromisoformat(job['started_at'])
+            response['render_seconds'] = round(elapsed.total_seconds(), 2)
+        if job['status'] == 'completed':
+            response['video_url'] = f"/api/offline/download-video/{job['result']}"
+        elif job['status'] == 'failed':
+            response['error'] = job['error']
+        return jsonify(response)
+        
+    except Exception as e:
+        print(f"Status check error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @offline_video_bp.route('/save-draft', methods=['POST'])
 @cross_origin()
 def save_draft():
@@ -94,6 +239,69 @@ def load_draft(draft_id):
         print(f"Draft load error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@offline_video_bp.route('/render-draft/<draft_id>', methods=['POST'])
+@cross_origin()
+def render_draft(draft_id):
+    """
+    Queue a render of a saved draft, reusing every segment unchanged since its last render.
+    Defaults to per-segment rendering so cached clips are spliced without re-encoding.
+    Poll status_url for progress, render_seconds and the video URL.
+    """
+    try:
+        draft = offline_ai.load_draft(draft_id)
+        if not draft:
+            return jsonify({'error': 'Draft not found'}), 404
+        
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        settings = dict(draft['settings'], **data)
+        script = settings.get('script', draft['script'])
+        voice_id = settings.get('voice_id', draft['voice_id'])
+        style = settings.get('style', 'business')
+        options = {
+            'render_mode': settings.get('render_mode', 'segments'),
+            'parallel': settings.get('parallel', False),
+            'max_workers': settings.get('max_workers'),
+            'normalize_audio': settings.get('normalize_audio'),
+            'encode_profile': settings.get('encode_profile', 'default'),
+            'use_cache': settings.get('use_cache', True)
+        }
+        
+        try:
+            options['max_workers'] = parse_max_workers(options['max_workers'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not isinstance(options['use_cache'], bool):
+            return jsonify({'error': 'use_cache must be true or false'}), 400
+        
+        # A cold-cache render takes minutes, so it runs on the job queue
+        job_id = str(uuid.uuid4())
+        options['job_id'] = job_id
+        job_queue.submit(
+            process_offline_generation, script, voice_id, style, draft['title'], options,
+            job_id=job_id,
+            stages=['render'],
+            metadata={'origin': 'offline', 'draft_id': draft_id}
+        )
+        
+        return jsonify({
+            'job_id': job_id,
+            'draft_id': draft_id,
+            'status': 'queued',
+            'status_url': f'/api/offline/job-status/{job_id}',
+            'message': 'Draft render queued',
+            'offline': True
+        }), 202
+        
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        print(f"Draft render error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @offline_video_bp.route('/list-drafts', methods=['GET'])
 @cross_origin()
 def list_drafts():
@@ -193,11 +401,60 @@ def generate_image_offline():
         print(f"Offline image generation error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@offline_video_bp.route('/templates', methods=['GET'])
+@cross_origin()
+def list_templates():
+    """List image style templates available offline"""
+    try:
+        from src.services.offline_ai_service import DEFAULT_IMAGE_TEMPLATES
+        
+        return jsonify({
+            'templates': DEFAULT_IMAGE_TEMPLATES + offline_ai.list_registered_templates(),
+            'offline': True
+        })
+        
+    except Exception as e:
+        print(f"Template list error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@offline_video_bp.route('/register-template', methods=['POST'])
+@cross_origin()
+def register_template():
+    """Register a new image style template at runtime"""
+    try:
+        data = request.json
+        name = data.get('name', '')
+        color = data.get('color', '')
+        style = data.get('style', 'professional')
+        category = data.get('category', 'custom')
+        
+        if not name or not color:
+            return jsonify({'error': 'Name and color are required'}), 400
+        
+        try:
+            template = offline_ai.register_style_template(name, color, style, category)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'template': template,
+            'status': 'registered',
+            'offline': True
+        })
+        
+    except Exception as e:
+        print(f"Template registration error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @offline_video_bp.route('/offline-status', methods=['GET'])
 @cross_origin()
 def offline_status():
     """Get offline capabilities status"""
     try:
+        # Resident TTS workers, if this engine uses them
+        tts_engine = getattr(offline_ai, 'tts_engine', None)
+        synthesis_pool = get_synthesis_pool(tts_engine) if tts_engine in ('espeak', 'festival') else None
+        
         # Check available offline features
         status = {
             'offline_mode': True,
@@ -206,7 +463,8 @@ def offline_status():
             'video_generation_available': True,
             'voice_processing_available': True,
             'local_storage_available': os.path.exists(offline_ai.db_path),
-            'temp_space_available': os.path.exists(offline_ai.temp_dir)
+            'temp_space_available': os.path.exists(offline_ai.temp_dir),
+            'resident_tts': synthesis_pool.get_status() if synthesis_pool else None
         }
         
         return jsonify(status)
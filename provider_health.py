@@ -0,0 +1,205 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+# Client exception classes (requests, httpx, openai, elevenlabs) that mean the provider
+# is unreachable or overloaded; matched by name so no SDK has to be imported here
+TRANSIENT_ERROR_NAMES = frozenset([
+    'ConnectionError', 'APIConnectionError', 'ConnectError', 'NetworkError',
+    'RemoteProtocolError', 'RateLimitError', 'InternalServerError', 'ServiceUnavailableError'
+])
+
+
+def is_transient_error(error):
+    """
+    True for failures that say the provider itself is unhealthy: timeouts,
+    connection errors, 429 and 5xx. Bad requests, content-policy rejections
+    and local errors (e.g. writing the output file) say nothing about it.
+    """
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(
+        'Timeout' in cls.__name__ or cls.__name__ in TRANSIENT_ERROR_NAMES
+        for cls in type(error).__mro__
+    )
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+    closed: calls go through; `failure_threshold` consecutive failures trip it open.
+    open: calls fail fast until `cooldown` seconds pass.
+    half_open: a single trial call (or background probe) decides whether to close or re-open.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, cooldown=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.last_error = None
+        self.last_failure_at = None
+        self.short_circuited = 0
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                print(f"Provider {self.name} recovered, closing circuit")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self, error=None):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.last_error = str(error) if error is not None else None
+            self.last_failure_at = datetime.now().isoformat()
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"Provider {self.name} unhealthy, opening circuit for {self.cooldown}s")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Give up a half-open trial without recording an outcome"""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def is_probe_due(self):
+        with self.lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown
+
+    def get_status(self):
+        with self.lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, round(self.cooldown - (time.monotonic() - self.opened_at), 1))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'cooldown_seconds': self.cooldown,
+                'retry_in_seconds': retry_in,
+                'short_circuited': self.short_circuited,
+                'last_error': self.last_error,
+                'last_failure_at': self.last_failure_at
+            }
+
+
+class ProviderHealth:
+    """
+    Circuit breakers for all remote providers, plus a background prober that
+    tests open circuits so they can recover without waiting for user traffic.
+    Tune with PROVIDER_FAILURE_THRESHOLD, PROVIDER_COOLDOWN_SECONDS and
+    PROVIDER_PROBE_INTERVAL.
+    """
+
+    def __init__(self):
+        self.failure_threshold = int(os.getenv('PROVIDER_FAILURE_THRESHOLD', '3'))
+        self.cooldown = float(os.getenv('PROVIDER_COOLDOWN_SECONDS', '30'))
+        self.probe_interval = float(os.getenv('PROVIDER_PROBE_INTERVAL', '10'))
+        self.breakers = {}
+        self.probes = {}
+        self.lock = threading.Lock()
+        self.prober = None
+
+    def breaker(self, name):
+        breaker = self.breakers.get(name)
+        if breaker is not None:
+            return breaker
+        with self.lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(name, self.failure_threshold, self.cooldown)
+            return self.breakers[name]
+
+    def call(self, name, func, *args, **kwargs):
+        """
+        Run a provider call through its breaker; raises CircuitOpenError when open.
+        Only transient errors (see is_transient_error) count towards tripping it.
+        """
+        breaker = self.breaker(name)
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"{name} circuit is open, using fallback")
+        recorded = False
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_transient_error(e):
+                breaker.record_failure(e)
+            else:
+                # The provider answered, so it is reachable; this also settles a half-open trial
+                breaker.record_success()
+            recorded = True
+            raise
+        finally:
+            if not recorded and sys.exc_info()[0] is not None:
+                # Interrupted (e.g. SystemExit): free the trial so the circuit can still recover
+                breaker.release_trial()
+        breaker.record_success()
+        return result
+
+    def register_probe(self, name, probe):
+        """Register a cheap health check used to recover an open circuit"""
+        with self.lock:
+            self.probes[name] = probe
+            if self.prober is None:
+                self.prober = threading.Thread(target=self._probe_loop, name="provider-prober", daemon=True)
+                self.prober.start()
+
+    def get_status(self):
+        with self.lock:
+            breakers = dict(self.breakers)
+        return {name: breaker.get_status() for name, breaker in breakers.items()}
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            with self.lock:
+                probes = dict(self.probes)
+            for name, probe in probes.items():
+                breaker = self.breaker(name)
+                if not breaker.is_probe_due() or not breaker.allow_request():
+                    continue
+                try:
+                    probe()
+                    breaker.record_success()
+                except Exception as e:
+                    breaker.record_failure(e)
+
+
+provider_health = ProviderHealth()
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TokenBucket:
+    """Token bucket: `rate` tokens per second, up to `capacity` saved for bursts"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until `tokens` are available; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class ProviderLimiter:
+    """Caps in-flight calls and request rate for one remote provider"""
+
+    def __init__(self, name, max_concurrency, rate_per_second, burst):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.in_flight = 0
+        self.total_calls = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        """Hold one concurrency slot and one rate token for the duration of a call"""
+        self.semaphore.acquire()
+        try:
+            self.bucket.acquire()
+            with self.lock:
+                self.in_flight += 1
+                self.total_calls += 1
+            try:
+                yield
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+        finally:
+            self.semaphore.release()
+
+    def get_status(self):
+        with self.lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'rate_per_second': self.bucket.rate,
+                'burst': self.bucket.capacity,
+                'in_flight': self.in_flight,
+                'total_calls': self.total_calls
+            }
+
+
+# Defaults per provider: (max concurrency, requests per second, burst)
+DEFAULT_PROVIDER_LIMITS = {
+    'elevenlabs': (4, 2.0, 4),
+    'openai_tts': (8, 3.0, 8),
+    'openai_images': (4, 1.0, 4),
+    'openai_chat': (4, 2.0, 4)
+}
+
+
+class ProviderLimits:
+    """
+    Process-wide limiters, one per provider. Override the defaults with
+    PROVIDER_<NAME>_CONCURRENCY, PROVIDER_<NAME>_RATE and PROVIDER_<NAME>_BURST.
+    """
+
+    def __init__(self, defaults=None):
+        self.defaults = defaults or DEFAULT_PROVIDER_LIMITS
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        limiter = self.limiters.get(name)
+        if limiter is not None:
+            return limiter
+
+        with self.lock:
+            if name not in self.limiters:
+                concurrency, rate, burst = self.defaults.get(name, (4, 2.0, 4))
+                prefix = f"PROVIDER_{name.upper()}"
+                self.limiters[name] = ProviderLimiter(
+                    name,
+                    int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+                    float(os.getenv(f"{prefix}_RATE", rate)),
+                    float(os.getenv(f"{prefix}_BURST", burst))
+                )
+            return self.limiters[name]
+
+    def slot(self, name):
+        return self.get(name).slot()
+
+    def get_status(self):
+        with self.lock:
+            return {name: limiter.get_status() for name, limiter in self.limiters.items()}
+
+
+provider_limits = ProviderLimits()
@@ -0,0 +1,147 @@
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+
+
+class ServiceRegistry:
+    """Builds services on first use instead of at import time"""
+
+    def __init__(self):
+        self.factories = {}
+        self.instances = {}
+        self.states = {}
+        self.lock = threading.Lock()
+        self.service_locks = {}
+
+    def register(self, name, factory):
+        """
+        Register a service factory.
+        `factory` is a callable or a 'module.path:ClassName' string so the
+        module itself is only imported when the service is first needed.
+        """
+        with self.lock:
+            self.factories[name] = factory
+            self.service_locks[name] = threading.Lock()
+            self.states[name] = {'status': 'not_loaded', 'load_seconds': None, 'loaded_at': None, 'error': None}
+
+    def get(self, name):
+        """Return the service instance, building it on first call"""
+        instance = self.instances.get(name)
+        if instance is not None:
+            return instance
+
+        if name not in self.factories:
+            raise KeyError(f"Unknown service: {name}")
+
+        with self.service_locks[name]:
+            # Another thread may have finished loading while we waited
+            instance = self.instances.get(name)
+            if instance is not None:
+                return instance
+
+            self._set_state(name, status='loading', error=None)
+            started = time.time()
+            try:
+                instance = self._resolve(self.factories[name])()
+            except Exception as e:
+                self._set_state(name, status='failed', error=str(e))
+                raise
+
+            self.instances[name] = instance
+            self._set_state(
+                name,
+                status='ready',
+                load_seconds=round(time.time() - started, 3),
+                loaded_at=datetime.now().isoformat()
+            )
+            return instance
+
+    def proxy(self, name):
+        """Return a stand-in that builds the service on first attribute access"""
+        return LazyService(self, name)
+
+    def is_loaded(self, name):
+        return name in self.instances
+
+    def warmup(self, names=None, background=True):
+        """Load services ahead of first use, in a daemon thread by default"""
+        names = list(names) if names is not None else list(self.factories)
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Warmup of service {name} failed: {e}")
+
+        if not background:
+            load_all()
+            return None
+
+        thread = threading.Thread(target=load_all, name="service-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def get_status(self):
+        """Report load state of every registered service"""
+        with self.lock:
+            services = {name: dict(state) for name, state in self.states.items()}
+        return {
+            'ready': all(state['status'] == 'ready' for state in services.values()),
+            'services': services
+        }
+
+    def _set_state(self, name, **updates):
+        with self.lock:
+            self.states[name].update(updates)
+
+    def _resolve(self, factory):
+        if isinstance(factory, str):
+            module_path, attr = factory.split(':')
+            return getattr(importlib.import_module(module_path), attr)
+        return factory
+
+
+class LazyService:
+    """Attribute proxy that defers service construction until it is used"""
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+
+# Shared registry used by all blueprints
+services = ServiceRegistry()
+services.register('voice_cloning', 'src.services.voice_cloning:VoiceCloningService')
+services.register('image_generation', 'src.services.image_generation:ImageGenerationService')
+services.register('offline_ai', 'src.services.offline_ai_service:OfflineAIService')
+services.register('dzongkha', 'src.services.dzongkha_service:DzongkhaService')
+services.register('advanced_video', 'src.services.advanced_video_generation:AdvancedVideoGenerationService')
+# One render queue for every blueprint, so VIDEO_JOB_WORKERS caps all render jobs together
+services.register('job_queue', 'src.services.job_queue:JobQueueService')
+
+
+def in_worker_process():
+    """
+    True inside a multiprocessing child (e.g. a render worker). Spawned children
+    re-import the app's main module, which must not start server-only work there.
+    """
+    return multiprocessing.current_process().name != 'MainProcess'
+
+
+def start_warmup_from_env():
+    """Warm up services listed in SERVICE_WARMUP (comma separated, or 'all')"""
+    warmup = os.getenv('SERVICE_WARMUP', '').strip()
+    if not warmup or in_worker_process():
+        return None
+    names = None if warmup == 'all' else [name.strip() for name in warmup.split(',') if name.strip()]
+    return services.warmup(names)
@@ -0,0 +1,438 @@
+"""
+Resident TTS backends for the offline pipeline.
+
+Spawning espeak/festival per sentence costs far more than the synthesis
+itself. These workers start once, keep their voices loaded and take
+sentences over stdin:
+
+- espeak: a worker process (this file run with --espeak-worker) that loads
+  libespeak-ng through ctypes and streams raw PCM back per request
+- festival: `festival --pipe` fed Scheme commands, one wave file per request
+
+Workers are health-checked and restarted after a crash or timeout.
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+import queue
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SynthesisError(Exception):
+    pass
+
+
+class ResidentWorker(ABC):
+    """One long-lived synthesis process"""
+
+    startup_timeout = 10.0
+
+    def __init__(self, request_timeout=30.0):
+        self.request_timeout = request_timeout
+        self.process = None
+        self.restarts = 0
+        self._buffer = b''
+
+    @abstractmethod
+    def command(self):
+        """argv that starts the worker process"""
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self._buffer = b''
+        self.on_start()
+
+    def on_start(self):
+        pass
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.kill()
+            self.process.wait(timeout=5)
+        except Exception:
+            pass
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def ensure_running(self):
+        if not self.is_alive():
+            if self.process is not None:
+                self.restarts += 1
+            self.start()
+
+    @abstractmethod
+    def synthesize(self, text, voice):
+        """Return (pcm_bytes, sample_rate) for one sentence"""
+
+    @abstractmethod
+    def ping(self):
+        """Return True if the worker answers"""
+
+    def _send(self, data):
+        try:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise SynthesisError(f"worker stdin closed: {e}")
+
+    def _read_exact(self, size, deadline):
+        fd = self.process.stdout.fileno()
+        while len(self._buffer) < size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise SynthesisError("worker timed out")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise SynthesisError("worker exited")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def _read_line(self, deadline):
+        fd = self.process.stdout.fileno()
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise SynthesisError("worker timed out")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise SynthesisError("worker exited")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line
+
+
+class EspeakWorker(ResidentWorker):
+    """libespeak-ng loaded once in a child process, fed JSON requests"""
+
+    def __init__(self, rate=150, pitch=50, request_timeout=30.0):
+        super().__init__(request_timeout)
+        self.rate = rate
+        self.pitch = pitch
+        self.sample_rate = None
+
+    def command(self):
+        return [sys.executable, os.path.abspath(__file__), '--espeak-worker']
+
+    def on_start(self):
+        header = json.loads(self._read_line(time.time() + self.startup_timeout))
+        if not header.get('ready'):
+            self.stop()
+            raise SynthesisError(header.get('error', 'espeak worker failed to start'))
+        self.sample_rate = header['sample_rate']
+
+    def synthesize(self, text, voice):
+        request = {'text': text, 'voice': voice, 'rate': self.rate, 'pitch': self.pitch}
+        self._send(json.dumps(request).encode('utf-8') + b'\n')
+
+        deadline = time.time() + self.request_timeout
+        header = json.loads(self._read_line(deadline))
+        if not header.get('ok'):
+            raise SynthesisError(header.get('error', 'espeak synthesis failed'))
+        return self._read_exact(header['bytes'], deadline), header['sample_rate']
+
+    def ping(self):
+        self._send(b'{"ping": true}\n')
+        return json.loads(self._read_line(time.time() + 5.0)).get('ok', False)
+
+
+class FestivalWorker(ResidentWorker):
+    """`festival --pipe` with the voice loaded once; results come back as wave files"""
+
+    def __init__(self, voice_command='(voice_kal_diphone)', request_timeout=30.0):
+        super().__init__(request_timeout)
+        self.voice_command = voice_command
+        self.scratch_dir = tempfile.mkdtemp(prefix='festival_worker_')
+        self.counter = 0
+
+    def command(self):
+        return ['festival', '--pipe']
+
+    def on_start(self):
+        self._send(f'{self.voice_command}\n'.encode('utf-8'))
+        if not self.ping():
+            self.stop()
+            raise SynthesisError('festival failed to start')
+
+    def synthesize(self, text, voice):
+        self.counter += 1
+        wav_path = os.path.join(self.scratch_dir, f'utt_{self.counter}.wav')
+        done_path = wav_path + '.done'
+
+        escaped = text.replace('\\', '\\\\').replace('"', '\\"')
+        # The marker file is created only after the wave is fully written
+        self._send((
+            f'(utt.save.wave (utt.synth (Utterance Text "{escaped}")) "{wav_path}" \'riff)\n'
+            f'(fclose (fopen "{done_path}" "w"))\n'
+        ).encode('utf-8'))
+
+        try:
+            self._wait_for(done_path, time.time() + self.request_timeout)
+            with wave.open(wav_path, 'rb') as wav_file:
+                return wav_file.readframes(wav_file.getnframes()), wav_file.getframerate()
+        finally:
+            for path in (wav_path, done_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def ping(self):
+        self.counter += 1
+        done_path = os.path.join(self.scratch_dir, f'ping_{self.counter}.done')
+        self._send(f'(fclose (fopen "{done_path}" "w"))\n'.encode('utf-8'))
+        try:
+            self._wait_for(done_path, time.time() + self.startup_timeout)
+            return True
+        except SynthesisError:
+            return False
+        finally:
+            try:
+                os.remove(done_path)
+            except OSError:
+                pass
+
+    def _wait_for(self, path, deadline):
+        while not os.path.exists(path):
+            if not self.is_alive():
+                raise SynthesisError("worker exited")
+            if time.time() > deadline:
+                raise SynthesisError("worker timed out")
+            time.sleep(0.001)
+
+
+class SynthesisPool:
+    """Fixed set of resident workers shared by all callers in this process"""
+
+    def __init__(self, worker_factory, size=2):
+        self.worker_factory = worker_factory
+        self.size = size
+        self.idle = queue.Queue()
+        self.workers = []
+        self.failures = 0
+        self.lock = threading.Lock()
+
+        for _ in range(size):
+            worker = worker_factory()
+            worker.start()
+            self.workers.append(worker)
+            self.idle.put(worker)
+
+    def synthesize(self, text, voice=None):
+        """Return (pcm_bytes, sample_rate); restarts the worker if it fails"""
+        worker = self.idle.get()
+        try:
+            worker.ensure_running()
+            return worker.synthesize(text, voice)
+        except SynthesisError:
+            with self.lock:
+                self.failures += 1
+            # Leave a fresh process behind for the next caller
+            try:
+                worker.restart()
+            except Exception as e:
+                print(f"Synthesis worker restart failed: {e}")
+            raise
+        finally:
+            self.idle.put(worker)
+
+    def synthesize_batch(self, texts, voice=None):
+        """Synthesize many sentences across the pool, keeping input order"""
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(lambda text: self.synthesize(text, voice), texts))
+
+    def health_check(self):
+        """Ping idle workers, restarting any that do not answer"""
+        healthy = 0
+        for _ in range(self.size):
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                # Busy workers are evidently alive
+                healthy += 1
+                continue
+            try:
+                worker.ensure_running()
+                if worker.ping():
+                    healthy += 1
+                else:
+                    worker.restart()
+            except Exception as e:
+                print(f"Synthesis worker health check failed: {e}")
+                try:
+                    worker.restart()
+                except Exception:
+                    pass
+            finally:
+                self.idle.put(worker)
+        return healthy
+
+    def start_health_checks(self, interval):
+        """Ping workers periodically from a daemon thread"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.health_check()
+
+        thread = threading.Thread(target=loop, name="synthesis-health", daemon=True)
+        thread.start()
+        return thread
+
+    def get_status(self):
+        return {
+            'workers': self.size,
+            'alive': sum(1 for worker in self.workers if worker.is_alive()),
+            'restarts': sum(worker.restarts for worker in self.workers),
+            'failures': self.failures
+        }
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_synthesis_pool(engine):
+    """
+    Return the shared pool for 'espeak' or 'festival', starting it on first use.
+    Returns None when resident synthesis is disabled or the engine cannot start.
+    """
+    if os.getenv('RESIDENT_TTS', '1') == '0':
+        return None
+
+    with _pools_lock:
+        if engine in _pools:
+            return _pools[engine]
+
+        size = int(os.getenv('RESIDENT_TTS_WORKERS', '2'))
+        factories = {'espeak': EspeakWorker, 'festival': FestivalWorker}
+        pool = None
+        if engine in factories:
+            try:
+                pool = SynthesisPool(factories[engine], size)
+                pool.start_health_checks(float(os.getenv('RESIDENT_TTS_HEALTH_INTERVAL', '30')))
+            except Exception as e:
+                print(f"Resident {engine} unavailable, using one process per sentence: {e}")
+
+        _pools[engine] = pool
+        return pool
+
+
+def write_pcm_wav(pcm, sample_rate, output_path):
+    """Write 16-bit mono PCM to a WAV file"""
+    with wave.open(output_path, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return output_path
+
+
+def _espeak_worker_main():
+    """Child process: load libespeak-ng once and answer JSON requests on stdin"""
+    import ctypes
+    import ctypes.util
+
+    out = sys.stdout.buffer
+
+    def reply(header, payload=b''):
+        out.write(json.dumps(header).encode('utf-8') + b'\n')
+        if payload:
+            out.write(payload)
+        out.flush()
+
+    library = ctypes.util.find_library('espeak-ng') or ctypes.util.find_library('espeak')
+    if not library:
+        reply({'ready': False, 'error': 'libespeak not found'})
+        return 1
+
+    lib = ctypes.CDLL(library)
+    AUDIO_OUTPUT_SYNCHRONOUS = 2
+    ESPEAK_RATE = 1
+    ESPEAK_PITCH = 3
+    POS_CHARACTER = 1
+    ESPEAK_CHARS_UTF8 = 1
+
+    sample_rate = lib.espeak_Initialize(AUDIO_OUTPUT_SYNCHRONOUS, 0, None, 0)
+    if sample_rate <= 0:
+        reply({'ready': False, 'error': 'espeak_Initialize failed'})
+        return 1
+
+    chunks = []
+    callback_type = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+
+    def on_audio(samples, count, events):
+        if samples and count > 0:
+            chunks.append(ctypes.string_at(samples, count * 2))
+        return 0
+
+    callback = callback_type(on_audio)
+    lib.espeak_SetSynthCallback(callback)
+    lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+    lib.espeak_Synth.argtypes = [
+        ctypes.c_char_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+        ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p, ctypes.c_void_p
+    ]
+
+    reply({'ready': True, 'sample_rate': sample_rate})
+    current_voice = None
+
+    for line in sys.stdin.buffer:
+        try:
+            request = json.loads(line)
+            if request.get('ping'):
+                reply({'ok': True})
+                continue
+
+            voice = request.get('voice') or 'en'
+            if voice != current_voice:
+                lib.espeak_SetVoiceByName(voice.encode('utf-8'))
+                current_voice = voice
+            lib.espeak_SetParameter(ESPEAK_RATE, int(request.get('rate', 150)), 0)
+            lib.espeak_SetParameter(ESPEAK_PITCH, int(request.get('pitch', 50)), 0)
+
+            text = request['text'].encode('utf-8') + b'\0'
+            del chunks[:]
+            lib.espeak_Synth(text, len(text), 0, POS_CHARACTER, 0, ESPEAK_CHARS_UTF8, None, None)
+            lib.espeak_Synchronize()
+
+            pcm = b''.join(chunks)
+            reply({'ok': True, 'bytes': len(pcm), 'sample_rate': sample_rate}, pcm)
+        except Exception as e:
+            reply({'ok': False, 'error': str(e)})
+
+    return 0
+
+
+if __name__ == '__main__' and '--espeak-worker' in sys.argv:
+    sys.exit(_espeak_worker_main())
@@ -0,0 +1,59 @@
+from functools import lru_cache
+from PIL import ImageFont
+
+DEFAULT_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+
+@lru_cache(maxsize=32)
+def load_font(path=DEFAULT_FONT_PATH, size=48):
+    """Load a font once per process"""
+    try:
+        return ImageFont.truetype(path, size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=65536)
+def text_width(font, text):
+    """Advance width of `text`, memoized per font"""
+    if hasattr(font, 'getlength'):
+        return font.getlength(text)
+    bbox = font.getbbox(text)
+    return bbox[2] - bbox[0]
+
+
+@lru_cache(maxsize=4096)
+def ink_width(font, text):
+    """Rendered (bounding box) width of a finished line, memoized per font"""
+    bbox = font.getbbox(text)
+    return bbox[2] - bbox[0]
+
+
+@lru_cache(maxsize=4096)
+def wrap_text(text, font, max_width):
+    """
+    Greedy word wrap in O(words): line widths are summed from cached word
+    and space widths instead of re-measuring the whole line per word.
+    Returns a tuple of (line, width) pairs.
+    """
+    space = text_width(font, ' ')
+    lines = []
+    current_line = []
+    current_width = 0
+
+    for word in text.split():
+        word_width = text_width(font, word)
+        candidate = current_width + space + word_width if current_line else word_width
+        if candidate < max_width:
+            current_line.append(word)
+            current_width = candidate
+        else:
+            if current_line:
+                lines.append(' '.join(current_line))
+            current_line = [word]
+            current_width = word_width
+
+    if current_line:
+        lines.append(' '.join(current_line))
+
+    return tuple((line, ink_width(font, line)) for line in lines)
@@ -1,29 +1,46 @@
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import cross_origin
 import os
 import uuid
 import json
+import shutil
 from werkzeug.utils import secure_filename
 import tempfile
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from src.services.voice_cloning import VoiceCloningService
-from src.services.image_generation import ImageGenerationService
+from src.services.service_registry import services
+from src.services.job_queue import QueueFullError
+from src.services.audio_timeline import assemble_narration, encode_timeline
+from src.services.encode_profiles import encode_fps, encode_resolution, video_encoder_args
 
 video_bp = Blueprint('video', __name__)
 
 # Configuration
 UPLOAD_FOLDER = '/tmp/uploads'
 OUTPUT_FOLDER = '/tmp/outputs'
+IMAGE_BATCH_FOLDER = os.path.join(OUTPUT_FOLDER, 'image_batches')
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'mp4', 'avi', 'mov', 'm4a', 'aac'}
+MAX_IMAGE_BATCH = int(os.getenv('MAX_IMAGE_BATCH', '200'))
 
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-# Initialize services
-voice_service = VoiceCloningService()
-image_service = ImageGenerationService()
+# Services are built on first use by the shared registry
+voice_service = services.proxy('voice_cloning')
+image_service = services.proxy('image_generation')
+offline_ai = services.proxy('offline_ai')  # Local slides for preview renders
+
+# Background workers that render videos outside the request thread, shared with offline_video
+job_queue = services.proxy('job_queue')
+
+# Shared pool for the remote TTS/image calls of all jobs; per-provider
+# concurrency and rate limits are enforced inside the services
+fanout_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('VIDEO_FANOUT_WORKERS', '16')),
+    thread_name_prefix='video-fanout'
+)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -36,23 +53,43 @@ def generate_video():
         data = request.json
         script = data.get('script', '')
         voice_id = data.get('voice_id', 'default')
+        preview = bool(data.get('preview', False))
+        preview_job_id = data.get('preview_job_id')
+        encode_profile = 'preview' if preview else data.get('encode_profile', 'default')
+        use_cache = data.get('use_cache', True)
         
         if not script:
             return jsonify({'error': 'Script is required'}), 400
+        if not isinstance(use_cache, bool):
+            return jsonify({'error': 'use_cache must be true or false'}), 400
         
         # Generate unique job ID
         job_id = str(uuid.uuid4())
         
-        # Process script and generate video
-        video_path = process_video_generation(script, voice_id, job_id)
+        # Queue the render; workers report progress through the job record
+        job_queue.submit(
+            process_video_generation, script, voice_id, job_id,
+            encode_profile=encode_profile,
+            preview=preview,
+            preview_job_id=preview_job_id,
+            use_cache=use_cache,
+            job_id=job_id,
+            stages=['audio', 'images', 'encoding'],
+            metadata={'origin': 'video', 'preview': preview, 'preview_job_id': preview_job_id}
+        )
         
         return jsonify({
             'job_id': job_id,
-            'status': 'completed',
+            'status': 'queued',
+            'preview': preview,
+            'preview_job_id': preview_job_id,
+            'status_url': f'/api/job-status/{job_id}',
             'video_url': f'/api/download-video/{job_id}',
-            'message': 'Video generated successfully'
-        })
+            'message': 'Video generation queued'
+        }), 202
         
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         print(f"Video generation error: {e}")
         return jsonify({'error': str(e)}), 500
@@ -109,6 +146,30 @@ def download_video(job_id):
 def get_job_status(job_id):
     """Get video generation job status"""
     try:
+        job = job_queue.get_job(job_id)
+        # The queue is shared with the offline blueprint, whose jobs report there
+        if job and job['metadata'].get('origin') != 'video':
+            return jsonify({'error': 'Job not found', 'job_id': job_id}), 404
+        if job:
+            response = {
+                'job_id': job_id,
+                'status': job['status'],
+                'stage': job['stage'],
+                'progress': job['stages'],
+                'queue_position': job['queue_position'],
+                'preview': job['metadata'].get('preview', False),
+                'preview_job_id': job['metadata'].get('preview_job_id'),
+                'created_at': job['created_at'],
+                'started_at': job['started_at'],
+                'finished_at': job['finished_at']
+            }
+            if job['status'] == 'completed':
+                response['video_url'] = f'/api/download-video/{job_id}'
+            elif job['status'] == 'failed':
+                response['error'] = job['error']
+            return jsonify(response)
+        
+        # Jobs from a previous process are only known by their output file
         video_path = os.path.join(OUTPUT_FOLDER, f"{job_id}.mp4")
         if os.path.exists(video_path):
             return jsonify({
@@ -117,14 +178,84 @@ def get_job_status(job_id):
                 'video_url': f'/api/download-video/{job_id}'
             })
         else:
-            return jsonify({
-                'job_id': job_id,
-                'status': 'processing'
-            })
+            return jsonify({'error': 'Job not found', 'job_id': job_id}), 404
     except Exception as e:
         print(f"Status check error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@video_bp.route('/job-queue/stats', methods=['GET'])
+@cross_origin()
+def get_job_queue_stats():
+    """Get video job queue depth and worker counts"""
+    try:
+        return jsonify(job_queue.get_stats())
+    except Exception as e:
+        print(f"Queue stats error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@video_bp.route('/generate-images-batch', methods=['POST'])
+@cross_origin()
+def generate_images_batch():
+    """Generate a batch of images, streaming one NDJSON line per image as it finishes"""
+    try:
+        data = request.json or {}
+        prompts = data.get('prompts', [])
+        style = data.get('style', 'realistic')
+        max_workers = data.get('max_workers')
+        use_cache = data.get('use_cache', True)
+        
+        if not isinstance(prompts, list) or not prompts:
+            return jsonify({'error': 'prompts must be a non-empty list'}), 400
+        if len(prompts) > MAX_IMAGE_BATCH:
+            return jsonify({'error': f'At most {MAX_IMAGE_BATCH} prompts per batch'}), 400
+        if not all(isinstance(prompt, str) and prompt.strip() for prompt in prompts):
+            return jsonify({'error': 'Every prompt must be non-empty text'}), 400
+        if not isinstance(use_cache, bool):
+            return jsonify({'error': 'use_cache must be true or false'}), 400
+        if max_workers is not None:
+            # Checked here because errors inside the stream would cut the response short
+            if isinstance(max_workers, bool) or not str(max_workers).isdigit() or int(max_workers) < 1:
+                return jsonify({'error': 'max_workers must be a positive integer'}), 400
+            max_workers = int(max_workers)
+        
+        batch_id = str(uuid.uuid4())
+        output_dir = os.path.join(IMAGE_BATCH_FOLDER, batch_id)
+        
+        def stream():
+            yield json.dumps({'batch_id': batch_id, 'total': len(prompts), 'status': 'started'}) + '\n'
+            completed = 0
+            try:
+                for result in image_service.generate_images_batch(prompts, output_dir, style, max_workers, use_cache):
+                    completed += 1
+                    item = {key: value for key, value in result.items() if key != 'path'}
+                    if result['path']:
+                        item['image_url'] = f"/api/image-batch/{batch_id}/{result['index']}"
+                    yield json.dumps(item) + '\n'
+                yield json.dumps({'batch_id': batch_id, 'completed': completed, 'status': 'finished'}) + '\n'
+            except Exception as e:
+                print(f"Image batch error: {e}")
+                yield json.dumps({'batch_id': batch_id, 'completed': completed, 'status': 'error', 'error': str(e)}) + '\n'
+        
+        return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        print(f"Image batch error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@video_bp.route('/image-batch/<batch_id>/<int:index>', methods=['GET'])
+@cross_origin()
+def download_batch_image(batch_id, index):
+    """Download one image from a generated batch"""
+    try:
+        image_path = os.path.join(IMAGE_BATCH_FOLDER, secure_filename(batch_id), f"image_{index:03d}.png")
+        if os.path.exists(image_path):
+            return send_file(image_path, mimetype='image/png')
+        else:
+            return jsonify({'error': 'Image not found'}), 404
+    except Exception as e:
+        print(f"Image download error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @video_bp.route('/available-voices', methods=['GET'])
 @cross_origin()
 def get_available_voices():
@@ -136,35 +267,60 @@ def get_available_voices():
         print(f"Voice list error: {e}")
         return jsonify({'error': str(e)}), 500
 
-def process_video_generation(script, voice_id, job_id):
-    """Process video generation from script"""
+def process_video_generation(script, voice_id, job_id, encode_profile='default', preview=False,
+                             preview_job_id=None, use_cache=True, progress_callback=None):
+    """
+    Process video generation from script.
+    All TTS and image requests are issued concurrently; point OPENAI_BASE_URL
+    and ELEVENLABS_BASE_URL at a local fake provider to exercise this offline.
+    A preview uses local slides instead of DALL-E; a render given the
+    preview's job id reuses its narration for every unchanged sentence.
+    use_cache=False generates every image afresh instead of reusing cached ones.
+    """
+    if progress_callback is None:
+        progress_callback = lambda *args, **kwargs: None
+    
     try:
         print(f"Starting video generation for job {job_id}")
         
         # Split script into segments for better processing
-        segments = split_script_into_segments(script)
+        segments = [segment for segment in split_script_into_segments(script) if segment.strip()]
         print(f"Split script into {len(segments)} segments")
         
-        # Generate audio for each segment
-        audio_files = []
-        for i, segment in enumerate(segments):
-            if segment.strip():  # Only process non-empty segments
-                audio_file = os.path.join(OUTPUT_FOLDER, f"{job_id}_audio_{i}.wav")
-                voice_service.generate_speech(segment, voice_id, audio_file)
-                audio_files.append(audio_file)
-                print(f"Generated audio for segment {i}")
+        audio_files = [os.path.join(OUTPUT_FOLDER, f"{job_id}_audio_{i}.wav") for i in range(len(segments))]
+        image_files = [os.path.join(OUTPUT_FOLDER, f"{job_id}_image_{i}.png") for i in range(len(segments))]
+        
+        preview_audio = load_preview_audio(preview_job_id, voice_id) if preview_job_id else {}
         
-        # Generate images for each segment
-        image_files = []
+        # Fan out audio and image generation for every segment at once
+        futures = {}
         for i, segment in enumerate(segments):
-            if segment.strip():  # Only process non-empty segments
-                image_file = os.path.join(OUTPUT_FOLDER, f"{job_id}_image_{i}.png")
-                image_service.generate_image_from_text(segment, image_file)
-                image_files.append(image_file)
-                print(f"Generated image for segment {i}")
+            if segment in preview_audio:
+                futures[fanout_executor.submit(shutil.copyfile, preview_audio[segment], audio_files[i])] = ('audio', i)
+            else:
+                futures[fanout_executor.submit(voice_service.generate_speech, segment, voice_id, audio_files[i])] = ('audio', i)
+            
+            if preview:
+                futures[fanout_executor.submit(offline_ai.generate_image_offline, segment, image_files[i])] = ('images', i)
+            else:
+                futures[fanout_executor.submit(image_service.generate_image_from_text, segment, image_files[i], use_cache=use_cache)] = ('images', i)
+        
+        completed = {'audio': 0, 'images': 0}
+        progress_callback('audio', 0, len(segments))
+        progress_callback('images', 0, len(segments))
+        for future in as_completed(futures):
+            stage, i = futures[future]
+            future.result()
+            completed[stage] += 1
+            progress_callback(stage, completed[stage], len(segments))
+            print(f"Generated {stage} for segment {i}")
+        
+        save_segment_manifest(job_id, voice_id, segments, audio_files)
         
         # Combine audio and images into video
-        video_path = combine_media_to_video(audio_files, image_files, job_id)
+        progress_callback('encoding', 0, 1)
+        video_path = combine_media_to_video(audio_files, image_files, job_id, encode_profile)
+        progress_callback('encoding', 1, 1)
         print(f"Video generation completed: {video_path}")
         
         return video_path
@@ -173,6 +329,36 @@ def process_video_generation(script, voice_id, job_id):
         print(f"Video generation failed: {e}")
         raise Exception(f"Video generation failed: {str(e)}")
 
+def segment_manifest_path(job_id):
+    return os.path.join(OUTPUT_FOLDER, f"{secure_filename(job_id)}_segments.json")
+
+def save_segment_manifest(job_id, voice_id, segments, audio_files):
+    """Record each sentence's narration so a later render of the same script can reuse it"""
+    manifest = {
+        'job_id': job_id,
+        'voice_id': voice_id,
+        'segments': [{'text': text, 'audio': audio} for text, audio in zip(segments, audio_files)]
+    }
+    with open(segment_manifest_path(job_id), 'w') as f:
+        json.dump(manifest, f)
+
+def load_preview_audio(preview_job_id, voice_id):
+    """Map sentence text to the preview's narration file, when the voice matches"""
+    try:
+        with open(segment_manifest_path(preview_job_id)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        print(f"No segment manifest for preview job {preview_job_id}")
+        return {}
+    
+    if manifest.get('voice_id') != voice_id:
+        return {}
+    return {
+        segment['text']: segment['audio']
+        for segment in manifest['segments']
+        if os.path.exists(segment['audio'])
+    }
+
 def split_script_into_segments(script):
     """Split script into logical segments"""
     import re
@@ -207,69 +393,41 @@ def split_script_into_segments(script):
     
     return segments
 
-def combine_media_to_video(audio_files, image_files, job_id):
+def combine_media_to_video(audio_files, image_files, job_id, encode_profile='default'):
     """Combine audio and images into final video"""
     video_path = os.path.join(OUTPUT_FOLDER, f"{job_id}.mp4")
     
+    narration_path = os.path.join(OUTPUT_FOLDER, f"{job_id}_narration.wav")
+    timeline_path = os.path.join(OUTPUT_FOLDER, f"{job_id}_timeline.txt")
+    
     try:
         if not audio_files or not image_files:
             raise Exception("No audio or image files to combine")
         
-        # Create a video for each audio-image pair
-        segment_videos = []
-        
-        for i, (audio_file, image_file) in enumerate(zip(audio_files, image_files)):
-            if os.path.exists(audio_file) and os.path.exists(image_file):
-                segment_video = os.path.join(OUTPUT_FOLDER, f"{job_id}_segment_{i}.mp4")
-                
-                # Create video segment with image and audio
-                cmd = [
-                    'ffmpeg', '-y',
-                    '-loop', '1', '-i', image_file,
-                    '-i', audio_file,
-                    '-c:v', 'libx264', '-c:a', 'aac',
-                    '-shortest', '-pix_fmt', 'yuv420p',
-                    '-vf', 'scale=1280:720',
-                    segment_video
-                ]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode != 0:
-                    print(f"FFmpeg error for segment {i}: {result.stderr}")
-                    continue
-                
-                segment_videos.append(segment_video)
-                print(f"Created segment video {i}: {segment_video}")
-        
-        if not segment_videos:
+        # Keep the segments whose audio and image were both generated
+        pairs = [
+            (audio_file, image_file)
+            for audio_file, image_file in zip(audio_files, image_files)
+            if os.path.exists(audio_file) and os.path.exists(image_file)
+        ]
+        if not pairs:
             raise Exception("No video segments were created successfully")
         
-        # If only one segment, just copy it
-        if len(segment_videos) == 1:
-            subprocess.run(['cp', segment_videos[0], video_path], check=True)
-        else:
-            # Concatenate all segments
-            concat_file = os.path.join(OUTPUT_FOLDER, f"{job_id}_concat.txt")
-            with open(concat_file, 'w') as f:
-                for segment in segment_videos:
-                    f.write(f"file '{segment}'\n")
-            
-            cmd = [
-                'ffmpeg', '-y',
-                '-f', 'concat', '-safe', '0', '-i', concat_file,
-                '-c', 'copy', video_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"FFmpeg concatenation error: {result.stderr}")
-                # Fallback: just use the first segment
-                subprocess.run(['cp', segment_videos[0], video_path], check=True)
+        # Narration is joined in memory and AAC-encoded once, so segment
+        # boundaries have no priming gaps
+        narration = assemble_narration([audio_file for audio_file, _ in pairs], narration_path)
+        print(f"Assembled {len(pairs)} segments into {narration.duration:.2f}s of narration")
+        
+        if not encode_timeline(
+            [image_file for _, image_file in pairs], narration, video_path,
+            list_path=timeline_path, encode_profile=encode_profile
+        ):
+            raise Exception("Timeline encode failed")
         
         # Clean up temporary files
-        for segment in segment_videos:
+        for path in (narration_path, timeline_path):
             try:
-                os.remove(segment)
+                os.remove(path)
             except:
                 pass
         
@@ -281,11 +439,12 @@ def combine_media_to_video(audio_files, image_files, job_id):
         if audio_files and image_files:
             cmd = [
                 'ffmpeg', '-y',
-                '-loop', '1', '-i', image_files[0],
-                '-i', audio_files[0],
-                '-c:v', 'libx264', '-c:a', 'aac',
+                '-loop', '1', '-framerate', str(encode_fps(encode_profile, 25)), '-i', image_files[0],
+                '-i', audio_files[0]
+            ] + video_encoder_args(encode_profile, 25) + [
+                '-c:a', 'aac',
                 '-shortest', '-pix_fmt', 'yuv420p',
-                '-vf', 'scale=1280:720',
+                '-vf', f"scale={encode_resolution(encode_profile).replace('x', ':')}",
                 video_path
             ]
             subprocess.run(cmd, capture_output=True)
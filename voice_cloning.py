@@ -4,6 +4,18 @@ from elevenlabs import ElevenLabs, Voice
 from elevenlabs.client import ElevenLabs
 import tempfile
 import json
+from src.services.media_cache import tts_cache
+from src.services.rate_limiter import provider_limits
+from src.services.provider_health import provider_health
+
+# Per-request timeout for OpenAI calls; the SDK default waits up to 10 minutes
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+
+# Model used by each remote TTS engine; part of the TTS cache key
+TTS_ENGINE_MODELS = {
+    'elevenlabs': 'eleven_multilingual_v2',
+    'openai': 'tts-1'
+}
 
 class VoiceCloningService:
     def __init__(self):
@@ -11,10 +23,17 @@ class VoiceCloningService:
         # You'll need to set ELEVENLABS_API_KEY environment variable
         self.elevenlabs_api_key = os.getenv('ELEVENLABS_API_KEY')
         if self.elevenlabs_api_key:
-            self.client = ElevenLabs(api_key=self.elevenlabs_api_key)
+            # ELEVENLABS_BASE_URL points the client at a fake provider in tests
+            base_url = os.getenv('ELEVENLABS_BASE_URL')
+            if base_url:
+                self.client = ElevenLabs(api_key=self.elevenlabs_api_key, base_url=base_url)
+            else:
+                self.client = ElevenLabs(api_key=self.elevenlabs_api_key)
+            provider_health.register_probe('elevenlabs', self.client.voices.get_all)
         else:
             self.client = None
             print("Warning: ELEVENLABS_API_KEY not set. Voice cloning will use fallback method.")
+        provider_health.register_probe('openai_tts', self._probe_openai)
     
     def clone_voice_from_sample(self, audio_file_path, voice_name=None):
         """
@@ -75,25 +94,43 @@ class VoiceCloningService:
     def generate_speech(self, text, voice_id, output_path):
         """Generate speech using cloned voice"""
         if self.client and not voice_id.startswith('fallback_'):
+            if tts_cache.fetch(self._speech_cache_key('elevenlabs', text, voice_id), output_path):
+                return output_path
             return self._generate_with_elevenlabs(text, voice_id, output_path)
         else:
             return self._generate_with_fallback(text, voice_id, output_path)
     
+    def _speech_cache_key(self, engine, text, voice_id):
+        """Stable TTS cache key for this text, voice and engine"""
+        return tts_cache.make_key(
+            text=text,
+            voice_id=voice_id,
+            engine=engine,
+            model_version=TTS_ENGINE_MODELS[engine],
+            sample_rate=None  # Provider default
+        )
+    
     def _generate_with_elevenlabs(self, text, voice_id, output_path):
         """Generate speech using ElevenLabs"""
+        def synthesize():
+            # The response streams, so the slot is held until the body is read
+            with provider_limits.slot('elevenlabs'):
+                # Generate audio
+                audio = self.client.generate(
+                    text=text,
+                    voice=Voice(voice_id=voice_id),
+                    model="eleven_multilingual_v2"
+                )
+                
+                # Save audio to file
+                with open(output_path, 'wb') as f:
+                    for chunk in audio:
+                        f.write(chunk)
+        
         try:
-            # Generate audio
-            audio = self.client.generate(
-                text=text,
-                voice=Voice(voice_id=voice_id),
-                model="eleven_multilingual_v2"
-            )
-            
-            # Save audio to file
-            with open(output_path, 'wb') as f:
-                for chunk in audio:
-                    f.write(chunk)
-            
+            # Skips straight to the fallback while ElevenLabs is unhealthy
+            provider_health.call('elevenlabs', synthesize)
+            tts_cache.put(self._speech_cache_key('elevenlabs', text, voice_id), output_path)
             return output_path
             
         except Exception as e:
@@ -102,19 +139,28 @@ class VoiceCloningService:
     
     def _generate_with_fallback(self, text, voice_id, output_path):
         """Fallback TTS method"""
+        cache_key = self._speech_cache_key('openai', text, voice_id)
+        if tts_cache.fetch(cache_key, output_path):
+            return output_path
+        
         # Use OpenAI TTS as fallback
         try:
             from openai import OpenAI
             
-            openai_client = OpenAI()
+            openai_client = OpenAI(timeout=OPENAI_TIMEOUT)
             
-            response = openai_client.audio.speech.create(
-                model="tts-1",
-                voice="alloy",  # Default voice
-                input=text
-            )
+            def synthesize():
+                with provider_limits.slot('openai_tts'):
+                    response = openai_client.audio.speech.create(
+                        model="tts-1",
+                        voice="alloy",  # Default voice
+                        input=text
+                    )
+                    
+                    response.stream_to_file(output_path)
             
-            response.stream_to_file(output_path)
+            provider_health.call('openai_tts', synthesize)
+            tts_cache.put(cache_key, output_path)
             return output_path
             
         except Exception as e:
@@ -129,6 +175,11 @@ class VoiceCloningService:
             
             return output_path
     
+    def _probe_openai(self):
+        """Cheap authenticated request used to recover the OpenAI TTS circuit"""
+        from openai import OpenAI
+        OpenAI(timeout=OPENAI_TIMEOUT).models.list()
+    
     def list_available_voices(self):
         """List all available voices"""
         voices = []
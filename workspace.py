@@ -0,0 +1,48 @@
+import os
+import shutil
+import time
+import uuid
+
+
+class JobWorkspace:
+    """Private scratch directory for one render job, removed when the job ends"""
+
+    def __init__(self, base_dir, job_id=None, keep=False):
+        self.job_id = job_id or str(uuid.uuid4())
+        self.base_dir = base_dir
+        self.dir = os.path.join(base_dir, self.job_id)
+        self.keep = keep
+        os.makedirs(self.dir, exist_ok=True)
+
+    def path(self, name):
+        """Return a path for an intermediate file inside this workspace"""
+        return os.path.join(self.dir, name)
+
+    def cleanup(self):
+        if not self.keep:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+        return False
+
+
+def cleanup_stale_workspaces(base_dir, max_age_seconds=24 * 3600):
+    """Remove workspaces left behind by crashed or killed workers"""
+    if not os.path.isdir(base_dir):
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed